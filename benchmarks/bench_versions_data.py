@@ -0,0 +1,150 @@
+"""Benchmark suite for collecting the versions data at scale.
+
+Measures :func:`.parse_version`, :func:`.get_groups`,
+:func:`.resolve_folder_spec` for the default folder specifications of
+``docs-versions-menu``, and the full :func:`.get_version_data`, for synthetic
+sets of 10, 1k, 10k, and 100k folders. The folders are a reproducible random
+mix of final, pre-, post-, dev-, and local releases, and branches.
+
+This requires the `pytest-benchmark`_ plugin. The benchmarks are not collected
+by a plain ``pytest`` run; run them with
+
+    make benchmark
+
+or ``pytest benchmarks/bench_versions_data.py``. Each run of ``make benchmark``
+is saved in ``.benchmarks/``. Use ``make benchmark-compare`` to fail if any
+benchmark has become more than 20% slower than the previous saved run, e.g.
+before and after changes to ``folder_spec.py`` or ``groups.py``. Use
+``--benchmark-only -k 10000`` (etc.) to select benchmarks of a specific size.
+
+.. _pytest-benchmark: https://pytest-benchmark.readthedocs.io
+"""
+
+import random
+
+import pytest
+
+from docs_versions_menu.folder_spec import resolve_folder_spec
+from docs_versions_menu.groups import get_group_table, get_groups
+from docs_versions_menu.parse_version import parse_version
+from docs_versions_menu.version_data import get_version_data
+
+pytest.importorskip('pytest_benchmark')
+
+SIZES = [10, 1000, 10000, 100000]
+
+DEFAULT_BRANCH_SPEC = 'master, main'
+VERSIONS_SPEC = (
+    '(<branches> != <default-branch>), <releases>, <default-branch>'
+)
+LATEST_SPEC = '(<public-releases>)[-1]'
+WARNING_SPECS = {
+    'unreleased': '<branches>, <local-releases>',
+    'prereleased': '<pre-releases>',
+}
+
+
+def make_folders(n, seed=0):
+    """Return a list of `n` random (unique) folder names.
+
+    About 70% of the folders are releases: final, pre-, post-, dev-, and local
+    releases in the proportion ``4:2:1:1:1``. The remaining folders are
+    branches. The list always contains the default branch 'master'.
+    """
+    rng = random.Random(seed)
+    folders = {'master': None}
+    n_major = max(1, int(n ** (1 / 3)) // 2)
+    while len(folders) < n:
+        if rng.random() < 0.3:
+            folder = 'feature-%d' % rng.randrange(10 * n)
+        else:
+            folder = 'v%d.%d.%d' % (
+                rng.randrange(n_major),
+                rng.randrange(20),
+                rng.randrange(50),
+            )
+            folder += rng.choice(
+                [
+                    '',
+                    '',
+                    '',
+                    '',
+                    '-rc%d' % rng.randrange(1, 5),
+                    'b%d' % rng.randrange(1, 5),
+                    '.post%d' % rng.randrange(1, 3),
+                    '.dev%d' % rng.randrange(5),
+                    '+dev',
+                ]
+            )
+        folders[folder] = None
+    return list(folders)
+
+
+@pytest.fixture(scope='module', params=SIZES)
+def folders(request):
+    return make_folders(request.param)
+
+
+@pytest.fixture(scope='module')
+def groups(folders):
+    return get_groups(folders, default_branches=['master'])
+
+
+@pytest.fixture(scope='module')
+def gh_pages(folders, tmp_path_factory):
+    """Root of a ``gh-pages`` checkout with `folders` (without git history)."""
+    root = tmp_path_factory.mktemp('gh-pages-%d' % len(folders))
+    for folder in folders:
+        (root / folder).mkdir()
+    return root
+
+
+def test_parse_version(benchmark, folders):
+    """Parse all folder names without caching."""
+
+    def parse_all():
+        parse_version.cache_clear()
+        for folder in folders:
+            parse_version(folder)
+
+    benchmark(parse_all)
+
+
+def test_get_groups(benchmark, folders):
+    benchmark(get_groups, folders, default_branches=['master'])
+
+
+def test_get_group_table(benchmark, folders):
+    benchmark(get_group_table, folders, default_branches=['master'])
+
+
+@pytest.mark.parametrize(
+    'spec',
+    [VERSIONS_SPEC, LATEST_SPEC, *WARNING_SPECS.values()],
+    ids=['versions', 'latest', *WARNING_SPECS.keys()],
+)
+def test_resolve_folder_spec(benchmark, groups, spec):
+    benchmark(resolve_folder_spec, spec, groups)
+
+
+def test_resolve_outdated(benchmark, groups):
+    """Resolve the default 'outdated' warning spec."""
+    latest = resolve_folder_spec(LATEST_SPEC, groups)[-1]
+    benchmark(resolve_folder_spec, '(<releases> < %s)' % latest, groups)
+
+
+def test_get_version_data(benchmark, gh_pages, monkeypatch):
+    monkeypatch.chdir(gh_pages)
+
+    def collect():
+        return get_version_data(
+            suffix_latest=' (latest)',
+            default_branch_spec=DEFAULT_BRANCH_SPEC,
+            versions_spec=VERSIONS_SPEC,
+            latest_spec=LATEST_SPEC,
+            warnings=dict(WARNING_SPECS),
+            label_specs=[],
+            downloads_file=None,
+        )
+
+    benchmark.pedantic(collect, rounds=3, warmup_rounds=1)
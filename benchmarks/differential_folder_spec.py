@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+"""Differential test and benchmark of the folder specification engines.
+
+Generates random sets of folders and random (valid) folder specifications
+following the grammar in the documentation, and resolves every specification
+with a straightforward reference implementation of
+:func:`.resolve_folder_spec` (the evaluation algorithm of earlier versions of
+docs-versions-menu) and with every combination of
+
+* evaluation engine (see :data:`.ENGINES`),
+* representation of the groups: a plain dict of sets (:func:`.get_groups`), a
+  pre-sorted :class:`.GroupTable` (:func:`.get_group_table`), or the groups of
+  an incrementally built :class:`.GroupIndex`,
+* caching: resolving each specification separately
+  (:func:`.resolve_folder_spec`), or resolving all specifications for the same
+  folders through a single :class:`.BatchResolver`.
+
+Any result that differs from the reference implementation is reported as a
+mismatch (and the script exits with a non-zero status). Since folders with
+equal versions (e.g. "v1.0.0" and "1.0.0") have no defined order relative to
+each other, the generated folder sets never contain more than one folder for
+the same version. For each combination,
+the total run time relative to the reference implementation is reported as a
+speedup.
+
+Usage:
+
+    python benchmarks/differential_folder_spec.py [--seed SEED] [--sets N]
+        [--specs N] [--folders N] [--verbose]
+"""
+
+import argparse
+import random
+import sys
+import time
+from collections import OrderedDict
+
+from docs_versions_menu.folder_spec import (
+    ENGINES,
+    BatchResolver,
+    _Condition,
+    _parse_folder_spec,
+    resolve_folder_spec,
+)
+from docs_versions_menu.groups import GroupIndex, get_group_table, get_groups
+from docs_versions_menu.parse_version import parse_version
+
+OPERATORS = ('in', 'not in', '<=', '<', '==', '!=', '>=', '>')
+SLICES = ('[-1]', '[0]', '[2]', '[1:]', '[:-1]', '[-3:]', '[::-1]', '[1::2]')
+BRANCHES = ('master', 'main', 'dev', 'feature-x', 'doc-testing', 'zz')
+SUFFIXES = ('-rc1', '-dev0', '-post1', '+dev', '-a2', '.post2', 'b1.dev1')
+
+
+def reference_resolve(spec, groups):
+    """Resolve `spec` with the reference implementation.
+
+    Every group is sorted when it is used, and every condition compares each
+    folder with each of its operands.
+    """
+    tokens = _parse_folder_spec(spec, tuple(groups.keys()), 10**7, 10**4)
+    return _reference_resolve(tokens, groups)
+
+
+def _reference_resolve(tokens, groups):
+    folders = []
+    for item in tokens:
+        if isinstance(item, str):
+            if item in groups['all']:
+                folders.append(item)
+        elif item[0] == '<':
+            folders.extend(sorted(groups[item[1]], key=parse_version))
+        else:  # parenthesized list
+            if isinstance(item[-1], slice):
+                _slice, sort, items = item[-1], False, item[1:-2]
+            else:
+                _slice, sort, items = slice(None), True, item[1:-1]
+            conditions = [c for c in items if isinstance(c, _Condition)]
+            items = [c for c in items if not isinstance(c, _Condition)]
+            selected = [
+                folder
+                for folder in _reference_resolve(items, groups)
+                if all(
+                    _reference_condition(folder, condition, groups)
+                    for condition in conditions
+                )
+            ]
+            if sort:
+                selected.sort(key=parse_version)
+            folders.extend(selected[_slice])
+    return list(OrderedDict.fromkeys(folders))  # remove duplicates
+
+
+def _reference_condition(folder, condition, groups):
+    if isinstance(condition.arg, str):
+        operands = [condition.arg]
+    else:
+        operands = _reference_resolve([condition.arg], groups)
+    version = parse_version(folder)
+    operands = [parse_version(operand) for operand in operands]
+    if condition.op == 'in':
+        return version in operands
+    elif condition.op == 'not in':
+        return version not in operands
+    elif condition.op == '<=':
+        return all(version <= v for v in operands)
+    elif condition.op == '<':
+        return all(version < v for v in operands)
+    elif condition.op == '==':
+        return all(version == v for v in operands)
+    elif condition.op == '!=':
+        return all(version != v for v in operands)
+    elif condition.op == '>=':
+        return all(version >= v for v in operands)
+    else:
+        return all(version > v for v in operands)
+
+
+class Generator:
+    """Random generator of folder sets and folder specifications."""
+
+    def __init__(self, seed, max_folders):
+        self.rng = random.Random(seed)
+        self.max_folders = max_folders
+
+    def version(self):
+        rng = self.rng
+        version = 'v%d.%d.%d' % (
+            rng.randint(0, 3),
+            rng.randint(0, 3),
+            rng.randint(0, 3),
+        )
+        if rng.random() < 0.1:
+            version = version[1:]  # no "v" prefix
+        if rng.random() < 0.5:
+            version += rng.choice(SUFFIXES)
+        return version
+
+    def folders(self):
+        rng = self.rng
+        folders = {}  # version => folder
+        for _ in range(rng.randint(0, self.max_folders)):
+            if rng.random() < 0.2:
+                folder = rng.choice(BRANCHES)
+            else:
+                folder = self.version()
+            folders.setdefault(parse_version(folder), folder)
+        return sorted(folders.values())
+
+    def item(self, folders, group_names, depth):
+        rng = self.rng
+        r = rng.random()
+        if r < 0.4 or depth > 2:
+            name = rng.choice(group_names)
+            if rng.random() < 0.1:
+                name = name.upper()
+            return '<%s>' % name
+        elif r < 0.55:
+            if len(folders) > 0 and rng.random() < 0.7:
+                return rng.choice(folders)
+            return rng.choice(['v1.0.0', 'nope', '1.1', 'v2.0.0-rc1'])
+        return self.parenthesized(folders, group_names, depth + 1)
+
+    def parenthesized(self, folders, group_names, depth):
+        rng = self.rng
+        items = [
+            self.item(folders, group_names, depth)
+            for _ in range(rng.randint(1, 2))
+        ]
+        spec = '(' + ', '.join(items)
+        for _ in range(rng.choice([0, 0, 1, 1, 2])):
+            operand = self.item(folders, group_names, depth)
+            spec += ' %s %s' % (rng.choice(OPERATORS), operand)
+        spec += ')'
+        if rng.random() < 0.4:
+            spec += rng.choice(SLICES)
+        return spec
+
+    def spec(self, folders, group_names):
+        items = [
+            self.item(folders, group_names, 0)
+            for _ in range(self.rng.randint(1, 3))
+        ]
+        return ', '.join(items)
+
+
+def _groups_dict(folders):
+    return get_groups(folders)
+
+
+def _groups_table(folders):
+    return get_group_table(folders)
+
+
+def _groups_index(folders):
+    index = GroupIndex()
+    for folder in folders:
+        index.add(folder)
+    return index.groups
+
+
+GROUP_MODES = OrderedDict(
+    [
+        ('dict', _groups_dict),
+        ('table', _groups_table),
+        ('index', _groups_index),
+    ]
+)
+
+CACHE_MODES = ('single', 'batch')
+
+
+def _resolve_all(specs, groups, engine, cache_mode):
+    if cache_mode == 'batch':
+        return BatchResolver(groups, engine=engine).resolve_all(specs)
+    else:
+        return [
+            resolve_folder_spec(spec, groups, engine=engine) for spec in specs
+        ]
+
+
+def run(seed, n_sets, n_specs, max_folders, verbose=False):
+    """Run the differential test.
+
+    Returns:
+        tuple: a list of mismatches ``(config, folders, spec, expected,
+        result)`` and a dict of the total run time (in seconds) for each
+        configuration, including the reference implementation (``config =
+        'reference'``).
+    """
+    generator = Generator(seed, max_folders)
+    configs = [
+        (engine, group_mode, cache_mode)
+        for engine in ENGINES
+        for group_mode in GROUP_MODES
+        for cache_mode in CACHE_MODES
+    ]
+    timings = OrderedDict([('reference', 0.0)])
+    timings.update((config, 0.0) for config in configs)
+    mismatches = []
+    for _ in range(n_sets):
+        folders = generator.folders()
+        all_groups = {
+            mode: make(folders) for mode, make in GROUP_MODES.items()
+        }
+        group_names = list(all_groups['dict'].keys())
+        specs = [generator.spec(folders, group_names) for _ in range(n_specs)]
+        start = time.perf_counter()
+        expected = [
+            reference_resolve(spec, all_groups['dict']) for spec in specs
+        ]
+        timings['reference'] += time.perf_counter() - start
+        for config in configs:
+            engine, group_mode, cache_mode = config
+            groups = all_groups[group_mode]
+            start = time.perf_counter()
+            results = _resolve_all(specs, groups, engine, cache_mode)
+            timings[config] += time.perf_counter() - start
+            for spec, folders_expected, result in zip(
+                specs, expected, results
+            ):
+                if result != folders_expected:
+                    mismatches.append(
+                        (config, folders, spec, folders_expected, result)
+                    )
+                    if verbose:
+                        print("MISMATCH %s: %r" % ("/".join(config), spec))
+    return mismatches, timings
+
+
+def main(argv=None):
+    """Run the differential test and print a report."""
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--sets', type=int, default=200, help="number of folder sets"
+    )
+    parser.add_argument(
+        '--specs', type=int, default=20, help="number of specs per folder set"
+    )
+    parser.add_argument(
+        '--folders', type=int, default=30, help="maximum folders per set"
+    )
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+    mismatches, timings = run(
+        args.seed, args.sets, args.specs, args.folders, verbose=args.verbose
+    )
+    n_specs = args.sets * args.specs
+    t_ref = timings['reference']
+    print(
+        "Resolved %d specifications for %d folder sets (seed %d)\n"
+        % (n_specs, args.sets, args.seed)
+    )
+    print("%-30s %12s %10s" % ("configuration", "time [ms]", "speedup"))
+    for config, seconds in timings.items():
+        if config != 'reference':
+            config = "/".join(config)
+        print(
+            "%-30s %12.3f %9.2fx" % (config, 1000 * seconds, t_ref / seconds)
+        )
+    print("")
+    for config, folders, spec, expected, result in mismatches[:10]:
+        print("MISMATCH (%s)" % "/".join(config))
+        print("    folders:  %r" % (folders,))
+        print("    spec:     %r" % spec)
+        print("    expected: %r" % (expected,))
+        print("    result:   %r" % (result,))
+    print("%d mismatches" % len(mismatches))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
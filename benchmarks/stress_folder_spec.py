@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""Stress benchmark for parsing and resolving nested folder specifications.
+
+Generates folder specifications of increasing nesting depth and increasing
+length (including specifications that are syntactically invalid only at the
+very end, which is the worst case for a backtracking parser), and reports the
+time for compiling and resolving each specification. The time per character
+should stay roughly constant, demonstrating linear runtime.
+
+Usage:
+
+    python benchmarks/stress_folder_spec.py
+"""
+
+import sys
+import timeit
+
+from docs_versions_menu.folder_spec import (
+    MAX_NESTING_DEPTH,
+    MAX_SPEC_LENGTH,
+    _parse_folder_spec,
+    compile_folder_spec,
+)
+from docs_versions_menu.groups import get_groups
+
+FOLDERS = ['master', 'main'] + [
+    'v%d.%d.%d%s' % (major, minor, patch, suffix)
+    for major in range(3)
+    for minor in range(5)
+    for patch in range(3)
+    for suffix in ('', '-rc1', '.post1')
+]
+
+GROUPS = get_groups(FOLDERS)
+GROUP_NAMES = tuple(GROUPS.keys())
+
+
+def nested_list(depth):
+    """``((((<releases>)))) ...``"""
+    return "(" * depth + "<releases>" + ")" * depth
+
+
+def nested_conditions(depth):
+    """``(<releases> < (<releases> < (...)[-1])[-1])``"""
+    spec = "<public-releases>"
+    for _ in range(depth):
+        spec = "(<releases> < (%s)[-1])" % spec
+    return spec
+
+
+def nested_lists_unterminated(depth):
+    """``(master, (master, (master, ...`` without closing parentheses."""
+    return "(master, " * depth + "<releases>"
+
+
+def long_list(n):
+    """``<releases>, master, (<branches>)[-1], ...`` with `n` items."""
+    items = ["<releases>", "master", "(<branches>)[-1]"] * (n // 3 + 1)
+    return ", ".join(items[:n])
+
+
+def long_list_invalid(n):
+    """A long list with a syntax error at the very end."""
+    return ", ".join(["(<releases> >= v1.0.0)"] * n) + " <branches>"
+
+
+def time_call(func, *args):
+    """Return the best time (in seconds) for a single call of `func`."""
+    timer = timeit.Timer(lambda: func(*args))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def parse(spec):
+    """Parse `spec`, without caching, returning None for invalid specs."""
+    try:
+        return _parse_folder_spec(spec, GROUP_NAMES, 10**7, 10**4)
+    except ValueError:
+        return None
+
+
+def resolve(spec):
+    """Compile and resolve `spec`."""
+    compiled = compile_folder_spec(
+        spec, GROUP_NAMES, max_length=10**7, max_depth=10**4
+    )
+    return compiled.evaluate(GROUPS)
+
+
+def report(title, generator, sizes, resolve_spec=True):
+    print(title)
+    print(
+        "%8s %10s %14s %14s %14s"
+        % ("size", "chars", "parse [ms]", "parse [µs/ch]", "resolve [ms]")
+    )
+    for size in sizes:
+        spec = generator(size)
+        t_parse = time_call(parse, spec)
+        t_resolve = float('nan')
+        if resolve_spec and parse(spec) is not None:
+            t_resolve = time_call(resolve, spec)
+        print(
+            "%8d %10d %14.3f %14.3f %14.3f"
+            % (
+                size,
+                len(spec),
+                1e3 * t_parse,
+                1e6 * t_parse / len(spec),
+                1e3 * t_resolve,
+            )
+        )
+    print("")
+
+
+def main():
+    """Run all stress benchmarks."""
+    print(
+        "Default limits: MAX_SPEC_LENGTH=%d, MAX_NESTING_DEPTH=%d\n"
+        % (MAX_SPEC_LENGTH, MAX_NESTING_DEPTH)
+    )
+    depths = [1, 10, 50, 100, 200]
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20 * max(depths)))
+    report("Nested lists", nested_list, depths)
+    report("Nested conditions", nested_conditions, depths)
+    report(
+        "Unterminated nested lists (invalid)",
+        nested_lists_unterminated,
+        depths,
+        resolve_spec=False,
+    )
+    lengths = [10, 100, 1000, 10000]
+    report("Long lists", long_list, lengths)
+    report(
+        "Long lists with trailing error (invalid)",
+        long_list_invalid,
+        lengths,
+        resolve_spec=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,13 +7,15 @@ import os
 import pprint
 import re
 import subprocess
+import time
 from collections import OrderedDict
 from pathlib import Path
 
 import click
 import jinja2
 
-from .version_data import get_version_data
+from .folder_spec import explain_folder_spec
+from .version_data import get_folder_groups, get_version_data
 
 __all__ = []
 
@@ -28,14 +30,38 @@ def write_versions_json(version_data, outfile, quiet=False):
         json.dump(version_data, out_fh)
     if not quiet:
         print("version_data =", json.dumps(version_data, indent=2))
-    subprocess.run(['git', 'add', outfile], check=False)
+    outfile = Path(outfile)
+    subprocess.run(
+        ['git', 'add', outfile.name], cwd=outfile.parent, check=False
+    )
+
+
+def _read_previous_version_data(outfile):
+    """Return the versions data from an existing `outfile`.
+
+    Return an empty dict if `outfile` does not exist or cannot be read.
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        with open(outfile) as in_fh:
+            previous_data = json.load(in_fh)
+        if not isinstance(previous_data, dict):
+            raise ValueError("not a JSON object")
+        logger.debug("Read previous versions data from %s", outfile)
+        return previous_data
+    except FileNotFoundError:
+        logger.debug("No previous versions data in %s", outfile)
+    except (OSError, ValueError) as exc:
+        logger.warning("Cannot read previous %s: %s", outfile, exc)
+    return {}
 
 
-def _write_index_html(version_data):
+def _write_index_html(version_data, root='.'):
     """Write an index.html that redirects to `default_folder`."""
     logger = logging.getLogger(__name__)
     logger.debug("Write index.html")
-    template_file = Path("index.html_t")
+    root = Path(root)
+    template_file = root / "index.html_t"
     if template_file.is_file():
         logger.debug("Using index.html template from %s", template_file)
     else:
@@ -43,21 +69,35 @@ def _write_index_html(version_data):
         logger.debug("Using default index.html template")
     template_str = template_file.read_text()
     template = jinja2.Environment().from_string(template_str)
-    with open("index.html", "w") as out_fh:
+    with open(root / "index.html", "w") as out_fh:
         out_fh.write(template.render(dict(version_data=version_data)))
-    subprocess.run(['git', 'add', 'index.html'], check=False)
+    subprocess.run(['git', 'add', 'index.html'], cwd=root, check=False)
 
 
-def _write_versions_py():
-    """Write a versions.py script for re-generating versions.json."""
+# Environment variables that must not be passed to versions.py: the script
+# already runs inside of the root, and must write versions.json
+_VERSIONS_PY_EXCLUDED_ENV_VARS = (
+    'DOCS_VERSIONS_MENU_ROOT',
+    'DOCS_VERSIONS_MENU_EXPLAIN',
+)
+
+
+def _write_versions_py(root='.'):
+    """Write a versions.py script for re-generating versions.json.
+
+    The script runs ``docs-versions-menu`` inside of `root`, with the same
+    ``DOCS_VERSIONS_MENU_*`` environment variables as the current process,
+    except for those in :data:`_VERSIONS_PY_EXCLUDED_ENV_VARS`.
+    """
     logger = logging.getLogger(__name__)
     logger.debug("Write versions.py")
     infile = Path(__file__).parent / '_script' / 'versions.py'
-    outfile = Path('versions.py')
+    outfile = Path(root) / 'versions.py'
     docs_env = {
         key: val
         for (key, val) in os.environ.items()
         if key.startswith("DOCS_VERSIONS_MENU_")
+        and key not in _VERSIONS_PY_EXCLUDED_ENV_VARS
     }
     with infile.open() as in_fh, outfile.open('w') as out_fh:
         for line in in_fh:
@@ -69,23 +109,54 @@ def _write_versions_py():
                 out_fh.write("}\n")
             else:
                 out_fh.write(line)
-    subprocess.run(['git', 'add', 'versions.py'], check=False)
+    subprocess.run(['git', 'add', 'versions.py'], cwd=root, check=False)
 
 
-def _ensure_no_jekyll():
+def _ensure_no_jekyll(root='.'):
     """Create a .nojekyll file.
 
     This prevents Github from messing with folders that start with an
     underscore.
     """
     logger = logging.getLogger(__name__)
-    nojekyll = Path('.nojekyll')
+    nojekyll = Path(root) / '.nojekyll'
     if nojekyll.is_file():
         logger.debug("%s exists", nojekyll)
     else:
         logger.debug("creating %s", nojekyll)
         nojekyll.touch()
-        subprocess.run(['git', 'add', str(nojekyll)], check=False)
+        subprocess.run(['git', 'add', nojekyll.name], cwd=root, check=False)
+
+
+def _explain(spec, default_branch_spec, custom_groups, root='.', **kwargs):
+    """Print an explanation of `spec` and a profile of the version data.
+
+    The `kwargs` are passed to :func:`.get_version_data`.
+    """
+    groups = get_folder_groups(
+        default_branch_spec, custom_groups, [spec], root=root
+    )
+    click.echo(explain_folder_spec(spec, groups))
+    timings = []
+    kwargs['downloads_cache'] = False  # no files are written with --explain
+    start = time.perf_counter()
+    get_version_data(
+        default_branch_spec=default_branch_spec,
+        custom_groups=custom_groups,
+        root=root,
+        timings=timings,
+        **kwargs,
+    )
+    total = time.perf_counter() - start
+    click.echo("")
+    click.echo(
+        "Run time of collecting the versions data: %.3f ms" % (1000 * total)
+    )
+    for description, seconds in sorted(timings, key=lambda t: -t[1]):
+        click.echo(
+            "%6.1f%% %10.3f ms  %s"
+            % (100 * seconds / total, 1000 * seconds, description)
+        )
 
 
 class _MultipleTuple(click.Tuple):
@@ -134,6 +205,19 @@ class DoctrLegacyCommand(click.Command):
 @click.option(
     '--debug', is_flag=True, help='enable debug logging', show_envvar=True
 )
+@click.option(
+    '--root',
+    default='.',
+    metavar='DIR',
+    help=(
+        'The root of the gh-pages branch, containing the folders for the '
+        'different versions of the documentation. Relative paths for '
+        'OUTFILE, and all other files that are read or written, are relative '
+        'to DIR. Defaults to the current working directory.'
+    ),
+    type=click.Path(exists=True, file_okay=False),
+    show_envvar=True,
+)
 @click.option(
     '-o',
     '--outfile',
@@ -225,6 +309,24 @@ class DoctrLegacyCommand(click.Command):
     ),
     show_envvar=True,
 )
+@click.option(
+    '--group',
+    type=_MultipleTuple([str, str]),
+    multiple=True,
+    metavar="NAME REGEX",
+    help=(
+        "Define a custom group of folders that may be referenced as <NAME> "
+        "in any SPEC. The group contains all folders whose name matches the "
+        "regular expression REGEX (anywhere in the folder name, unless "
+        "REGEX is anchored with '^' or '$'). "
+        "This option may be given multiple times. "
+        "If specified via an environment variable, use the form "
+        "\"NAME: REGEX; NAME: REGEX; ...\". "
+        "Any colons and semi-colons in NAME and REGEX must be escaped "
+        "in this case. See the online documentation for details."
+    ),
+    show_envvar=True,
+)
 @click.option(
     '--write-index-html/--no-write-index-html',
     default=True,
@@ -281,6 +383,42 @@ class DoctrLegacyCommand(click.Command):
         'DOCS_VERSIONS_MENU_DOWNLOADS_FILE="".'
     ),
 )
+@click.option(
+    '--downloads-cache/--no-downloads-cache',
+    default=False,
+    help=(
+        'Whether to cache the parsed downloads files of all folders in the '
+        'file .docs-versions-menu-cache, so that only downloads files that '
+        'have changed since the previous run have to be read. The cache file '
+        'should not be committed to the gh-pages branch.'
+    ),
+    show_default=True,
+    show_envvar=True,
+)
+@click.option(
+    '--incremental',
+    is_flag=True,
+    help=(
+        'Re-use the download links for all folders that have not changed '
+        'since the previous run, based on fingerprints (modification times) '
+        'stored in the existing OUTFILE.'
+    ),
+    show_envvar=True,
+)
+@click.option(
+    '--jobs',
+    '-j',
+    default=1,
+    metavar='N',
+    type=click.IntRange(min=1),
+    help=(
+        'The number of threads for reading the downloads files in all '
+        'folders concurrently. This may speed up the generation of the '
+        'versions data on a network file system.'
+    ),
+    show_default=True,
+    show_envvar=True,
+)
 @click.option(
     '--suffix-latest',
     default=' (latest)',
@@ -291,25 +429,44 @@ class DoctrLegacyCommand(click.Command):
     show_default=True,
     show_envvar=True,
 )
+@click.option(
+    '--explain',
+    metavar='SPEC',
+    help=(
+        'Instead of generating OUTFILE, show how the folder specification '
+        'SPEC is evaluated: the number of folders, run time, and folders for '
+        'each part of SPEC. Also show how much of the total run time is '
+        'spent on each of the folder specifications given by the other '
+        'options.'
+    ),
+    allow_from_autoenv=False,
+)
 def main(
     debug,
+    root,
     outfile,
     versions,
     default_branch,
     latest,
     warning,
     label,
+    group,
     write_index_html,
     write_versions_py,
     ensure_no_jekyll,
     downloads_file,
     no_downloads_file,
+    downloads_cache,
+    incremental,
+    jobs,
     suffix_latest,
+    explain,
 ):
     """Generate versions json file in OUTFILE.
 
     This should be run from the root of a ``gh-pages`` branch of a project
-    using the Docs Versions Menu.
+    using the Docs Versions Menu, or with the ``--root`` option pointing to
+    that root.
     """
     logging.basicConfig(level=logging.WARNING)
     logger = logging.getLogger(__name__)
@@ -331,9 +488,10 @@ def main(
     logger.debug("Start of docs-versions-menu")
     logger.debug("arguments = %s", pprint.pformat(locals()))
     logger.debug("cwd: %s", Path.cwd())
+    logger.debug("root: %s", root)
     logger.debug("ENV: %s", os.environ)
     logger.debug("Gather versions info")
-    if Path('doctr-versions-menu.conf').is_file():
+    if (Path(root) / 'doctr-versions-menu.conf').is_file():
         click.echo(
             "ERROR: Found legacy doctr-versions-menu.conf file. Config file "
             "settings are no longer supported. Use environment variables "
@@ -342,7 +500,7 @@ def main(
         )
         raise click.Abort()
     warnings = OrderedDict([(name.lower(), spec) for (name, spec) in warning])
-    version_data = get_version_data(
+    get_version_data_kwargs = dict(
         downloads_file=(downloads_file or None),  # False (in config) → None
         default_branch_spec=default_branch,
         suffix_latest=suffix_latest,
@@ -350,13 +508,29 @@ def main(
         latest_spec=latest,
         warnings=warnings,
         label_specs=label,
+        custom_groups=list(group),
+        root=root,
+        jobs=jobs,
+        downloads_cache=downloads_cache,
     )
+    if incremental:
+        get_version_data_kwargs['previous_data'] = _read_previous_version_data(
+            Path(root) / outfile
+        )
+    if explain is not None:
+        try:
+            _explain(explain, **get_version_data_kwargs)
+        except ValueError as exc:
+            click.echo("ERROR: %s" % exc, err=True)
+            raise click.Abort()
+        return
+    version_data = get_version_data(**get_version_data_kwargs)
     if write_index_html:
-        _write_index_html(version_data=version_data)
+        _write_index_html(version_data=version_data, root=root)
     if write_versions_py:
-        _write_versions_py()
+        _write_versions_py(root=root)
     if ensure_no_jekyll:
-        _ensure_no_jekyll()
+        _ensure_no_jekyll(root=root)
     logger.info("Write versions.json")
-    write_versions_json(version_data, outfile=outfile)
+    write_versions_json(version_data, outfile=Path(root) / outfile)
     logger.debug("End of docs-versions-menu")
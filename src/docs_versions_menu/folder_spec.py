@@ -1,207 +1,1378 @@
 """Parser for folder specifications."""
 
+import heapq
+import operator
+import re
+import string
+import time
 from collections import OrderedDict
-from functools import partial
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
 
-from pyparsing import (
-    DelimitedList,
-    Forward,
-    Group,
-    Literal,
-    Optional,
-    ParseException,
-    Word,
-    ZeroOrMore,
-    alphanums,
-    nums,
-    one_of,
-)
+from .parse_version import SortKeyTable, parse_version
+from .version_index import VersionIndex
 
-from .parse_version import parse_version
+# Maximum number of distinct (spec, group names) combinations for which the
+# parsed tokens are kept in memory
+_PARSE_CACHE_SIZE = 512
 
+#: Default for the maximum number of characters in a folder specification
+MAX_SPEC_LENGTH = 10000
 
-def _parse_folder_spec(spec, groups, sort_key):
-    """Parse the folder specification into a nested list.
+#: Default for the maximum nesting depth of parentheses in a folder
+#: specification
+MAX_NESTING_DEPTH = 50
+
+# The following defines the syntax of a folder specification:
+#
+#     Spec := ListSpec
+#     ListSpec := Item ("," Item)*
+#     Item := GroupName | FolderName | ParenthesizedListSpec
+#     GroupName := "<" name ">"
+#     name := [A-Za-z0-9][A-Za-z0-9\-_:]*    (if no group names are given)
+#     FolderName := [A-Za-z0-9][A-Za-z0-9.\-_+]*
+#     ParenthesizedListSpec := "(" ListSpec ConditionSpec* ")" SliceSpec?
+#     ConditionSpec := LogicalOperator (FolderName | GroupName |
+#                                       ParenthesizedListSpec)
+#     LogicalOperator := "in" | "not in" | "<=" | "<" | "==" | "!=" | ">="
+#                        | ">"
+#     SliceSpec := "[" Int? (":" Int?)? (":" Int?)? "]"
+#     Int := [0-9\-][0-9]*
+#
+# Whitespace is allowed between any two elements. The parser is a
+# recursive-descent parser that reproduces the behavior (tokens and the
+# position of syntax errors) of the `pyparsing` grammar used in earlier
+# versions, see tests/test_spec_parser.py. Where the grammar has alternatives,
+# the first matching alternative is used, without backtracking into a
+# successful match. Optional elements are skipped if they fail to match. When
+# all alternatives fail, the error is reported at the position where the
+# "furthest" alternative failed.
+#
+# The runtime of the parser is linear in the length of the specification:
+# Every alternative that can consume more than a single token
+# (ParenthesizedListSpec) is the *last* alternative, so that no part of the
+# specification is ever parsed by more than one alternative. The recursion
+# depth is limited by the `max_depth` of the parser (MAX_NESTING_DEPTH), which
+# also protects the recursive compilation and evaluation of the parsed tokens.
+
+_WHITESPACE = frozenset(' \t\n\r')
+_ALPHANUMS = frozenset(string.ascii_letters + string.digits)
+_FOLDER_NAME_CHARS = _ALPHANUMS | frozenset('.-_+')
+_GROUP_NAME_CHARS = _ALPHANUMS | frozenset('-_:')
+_INT_INIT_CHARS = frozenset(string.digits + '-')
+_INT_CHARS = frozenset(string.digits)
+_LOGICAL_OPERATORS = ('in', 'not in', '<=', '<', '==', '!=', '>=', '>')
+
+
+@dataclass(frozen=True, slots=True)
+class _Condition:
+    """Parsed ConditionSpec: a logical operator and its (parsed) argument.
+
+    The argument is either a folder name (str) or a tuple of parsed tokens for
+    a group name or a parenthesized list. Conditions are never evaluated
+    during parsing: they are compiled into a :class:`_ConditionNode`.
+    """
+
+    op: str
+    arg: object
+
+
+def _to_slice(text):
+    """Convert the content of a SliceSpec to slice instance.
+
+    Raises:
+        ValueError: if `text` does not contain a valid integer where one is
+            required.
+    """
+    parts = text.split(':')
+    if len(parts) == 1:
+        i = int(parts[0])
+        if i == -1:
+            return slice(i, None, None)
+        else:
+            return slice(i, i + 1, None)
+    else:
+        parts += [''] * (3 - len(parts))  # pad to length 3
+        start, stop, step = (int(v) if len(v) > 0 else None for v in parts)
+        return slice(start, stop, step)
+
+
+@lru_cache(maxsize=32)
+def _group_name_matcher(group_names):
+    """Return a function that matches a group name at a given location.
+
+    Args:
+        group_names (tuple[str] or None): The group names that may appear in
+            the specification (inside angled brackets). If None, any
+            alphanumeric name (including dashes, underscores, and colons) is
+            accepted as a group name.
+
+    The returned function takes arguments `spec` and `loc` and returns a tuple
+    ``(name, end)`` if a group name starts at `loc` in `spec`, or None
+    otherwise. Group names in `group_names` are matched case-insensitively,
+    preferring the longest match, and `name` is returned as given in
+    `group_names`.
+    """
+    if group_names is None:
+
+        def match_group_name(spec, loc):
+            if loc < len(spec) and spec[loc] in _ALPHANUMS:
+                end = loc + 1
+                while end < len(spec) and spec[end] in _GROUP_NAME_CHARS:
+                    end += 1
+                return spec[loc:end], end
+            return None
+
+    else:
+        symbol_map = {name.lower(): name for name in group_names}
+        if len(symbol_map) == 0:
+            return lambda spec, loc: None
+        rx = re.compile(
+            "|".join(
+                re.escape(name)
+                for name in sorted(symbol_map.values(), key=len, reverse=True)
+            ),
+            flags=re.IGNORECASE,
+        )
+
+        def match_group_name(spec, loc):
+            match = rx.match(spec, loc)
+            if match is None:
+                return None
+            return symbol_map[match.group().lower()], match.end()
+
+    return match_group_name
+
+
+class _ParseError(Exception):
+    """Failure to match an element of the grammar at a location `loc`."""
+
+    def __init__(self, loc):
+        super().__init__(loc)
+        self.loc = loc
+
+
+class _SpecParser:
+    """Recursive-descent parser for folder specifications.
+
+    Each of the ``parse_*`` methods takes the location `loc` at which to start
+    parsing and returns a tuple ``(tokens, loc)`` of the parsed token(s) and
+    the location after the parsed element. If the element does not match, the
+    method raises :exc:`_ParseError`. The runtime is linear in the length of
+    the `spec`. If parenthesized lists are nested deeper than `max_depth`, a
+    :exc:`ValueError` is raised.
+    """
+
+    def __init__(self, spec, group_names, max_depth=MAX_NESTING_DEPTH):
+        self.spec = spec
+        self.match_group_name = _group_name_matcher(group_names)
+        self.max_depth = max_depth
+        self.depth = 0
+
+    def skip_whitespace(self, loc):
+        spec = self.spec
+        while loc < len(spec) and spec[loc] in _WHITESPACE:
+            loc += 1
+        return loc
+
+    def parse_literal(self, loc, literal):
+        loc = self.skip_whitespace(loc)
+        if self.spec.startswith(literal, loc):
+            return literal, loc + len(literal)
+        raise _ParseError(loc)
+
+    def parse_word(self, loc, init_chars, body_chars):
+        loc = self.skip_whitespace(loc)
+        spec = self.spec
+        if loc < len(spec) and spec[loc] in init_chars:
+            end = loc + 1
+            while end < len(spec) and spec[end] in body_chars:
+                end += 1
+            return spec[loc:end], end
+        raise _ParseError(loc)
+
+    def parse_first(self, loc, alternatives):
+        """Parse the first matching of the `alternatives` (methods)."""
+        error = None
+        for alternative in alternatives:
+            try:
+                return alternative(loc)
+            except _ParseError as exc:
+                if error is None or exc.loc > error.loc:
+                    error = exc
+        raise error
+
+    def parse_spec(self):
+        """Parse the entire `spec` into a tuple of tokens."""
+        tokens, loc = self.parse_list_spec(0)
+        loc = self.skip_whitespace(loc)
+        if loc < len(self.spec):
+            raise _ParseError(loc)
+        return tokens
+
+    def parse_list_spec(self, loc):
+        item, loc = self.parse_item(loc)
+        items = [item]
+        while True:
+            try:
+                _, next_loc = self.parse_literal(loc, ',')
+                item, next_loc = self.parse_item(next_loc)
+            except _ParseError:
+                break
+            items.append(item)
+            loc = next_loc
+        return tuple(items), loc
+
+    def parse_item(self, loc):
+        return self.parse_first(
+            loc,
+            (
+                self.parse_group_name,
+                self.parse_folder_name,
+                self.parse_parenthesized_list_spec,
+            ),
+        )
+
+    def parse_group_name(self, loc):
+        _, loc = self.parse_literal(loc, '<')
+        loc = self.skip_whitespace(loc)
+        match = self.match_group_name(self.spec, loc)
+        if match is None:
+            raise _ParseError(loc)
+        name, loc = match
+        _, loc = self.parse_literal(loc, '>')
+        return ('<', name, '>'), loc
+
+    def parse_folder_name(self, loc):
+        return self.parse_word(loc, _ALPHANUMS, _FOLDER_NAME_CHARS)
+
+    def parse_parenthesized_list_spec(self, loc):
+        _, loc = self.parse_literal(loc, '(')
+        if self.depth >= self.max_depth:
+            raise ValueError(
+                "Invalid specification (nesting deeper than %d levels, "
+                "marked '*'): %r"
+                % (
+                    self.max_depth,
+                    _mark_input_line(self.spec, loc - 1, '*'),
+                )
+            )
+        self.depth += 1
+        try:
+            items, loc = self.parse_list_spec(loc)
+            tokens = ['(', *items]
+            while True:
+                try:
+                    condition, loc = self.parse_condition_spec(loc)
+                except _ParseError:
+                    break
+                tokens.append(condition)
+        finally:
+            self.depth -= 1
+        _, loc = self.parse_literal(loc, ')')
+        tokens.append(')')
+        try:
+            _slice, loc = self.parse_slice_spec(loc)
+            tokens.append(_slice)
+        except _ParseError:
+            pass
+        return tuple(tokens), loc
+
+    def parse_condition_spec(self, loc):
+        loc = self.skip_whitespace(loc)
+        for op in _LOGICAL_OPERATORS:
+            if self.spec.startswith(op, loc):
+                loc += len(op)
+                break
+        else:
+            raise _ParseError(loc)
+        arg, loc = self.parse_first(
+            loc,
+            (
+                self.parse_folder_name,
+                self.parse_group_name,
+                self.parse_parenthesized_list_spec,
+            ),
+        )
+        return _Condition(op, arg), loc
+
+    def parse_slice_spec(self, loc):
+        _, loc = self.parse_literal(loc, '[')
+        parts = []
+        start = self.skip_whitespace(loc)
+        try:
+            part, loc = self.parse_int(loc)
+            parts.append(part)
+        except _ParseError:
+            pass
+        for _ in range(2):
+            try:
+                _, next_loc = self.parse_literal(loc, ':')
+            except _ParseError:
+                break
+            parts.append(':')
+            loc = next_loc
+            try:
+                part, loc = self.parse_int(loc)
+                parts.append(part)
+            except _ParseError:
+                pass
+        _, loc = self.parse_literal(loc, ']')
+        try:
+            return _to_slice("".join(parts)), loc
+        except ValueError:
+            raise ValueError(
+                "Invalid specification (marked '*'): %r"
+                % _mark_input_line(self.spec, start, '*')
+            )
+
+    def parse_int(self, loc):
+        return self.parse_word(loc, _INT_INIT_CHARS, _INT_CHARS)
+
+
+def _mark_input_line(spec, loc, marker):
+    """Return the line of `spec` containing `loc`, with `marker` inserted."""
+    line_start = spec.rfind("\n", 0, loc) + 1
+    line_end = spec.find("\n", loc)
+    if line_end < 0:
+        line_end = len(spec)
+    line = spec[line_start:line_end]
+    col = loc - line_start
+    return (line[:col] + marker + line[col:]).strip()
+
+
+def _parse_folder_spec(
+    spec,
+    group_names,
+    max_length=MAX_SPEC_LENGTH,
+    max_depth=MAX_NESTING_DEPTH,
+):
+    """Parse the folder specification into a nested tuple.
 
     Args:
         spec (str): folder specification
-        groups (dict): map of group name to list of folders in group
-        sort_key (callable): map of folder name to sortable object.
+        group_names (tuple[str] or None): The names of all known groups, or
+            None to accept any group name.
+        max_length (int): The maximum number of characters in `spec`
+        max_depth (int): The maximum nesting depth of parenthesized lists
+
+    Returns:
+        tuple: tuple of parsed tokens
+
+    Raises:
+        ValueError: if `spec` cannot be parsed, or exceeds `max_length` or
+            `max_depth`.
+    """
+    if len(spec) > max_length:
+        raise ValueError(
+            "Invalid specification (longer than %d characters): %r..."
+            % (max_length, spec[:50])
+        )
+    if spec.strip() == '':
+        return ()
+    spec = spec.expandtabs()
+    try:
+        return _SpecParser(spec, group_names, max_depth).parse_spec()
+    except _ParseError as exc:
+        raise ValueError(
+            "Invalid specification (marked '*'): %r"
+            % _mark_input_line(spec, exc.loc, '*')
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class _FolderNode:
+    """A folder name in a compiled specification."""
+
+    name: str
+
+
+@dataclass(frozen=True, slots=True)
+class _GroupNode:
+    """A group name (``<name>``) in a compiled specification."""
+
+    name: str
+
+
+@dataclass(frozen=True, slots=True)
+class _ConditionNode:
+    """A logical operator with its operand (a node) in a compiled spec."""
+
+    op: str
+    operand: object
+    _hash: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Caching the hash avoids rehashing the entire subtree for every
+        # lookup of the node in the cache of a resolver
+        object.__setattr__(self, '_hash', hash((self.op, self.operand)))
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        # The cached hash is only valid within the same process
+        return (type(self), (self.op, self.operand))
+
+
+@dataclass(frozen=True, slots=True)
+class _ListNode:
+    """A parenthesized list in a compiled specification.
+
+    The `items` are resolved and filtered by the `conditions`. The result is
+    then either sorted (if `slice` is None) or sliced with the (start, stop,
+    step) tuple `slice`.
+    """
+
+    items: tuple
+    conditions: tuple = ()
+    slice: tuple = None
+    _hash: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(
+            self, '_hash', hash((self.items, self.conditions, self.slice))
+        )
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        # The cached hash is only valid within the same process
+        return (type(self), (self.items, self.conditions, self.slice))
+
+
+def _compile_token(token):
+    """Convert a single parsed token into a node of a compiled spec."""
+    if isinstance(token, str):
+        return _FolderNode(token)
+    if token[0] == '<':
+        return _GroupNode(token[1])
+    assert token[0] == '('
+    if isinstance(token[-1], slice):
+        _slice = (token[-1].start, token[-1].stop, token[-1].step)
+        sub_tokens = token[1:-2]
+    else:
+        _slice = None
+        sub_tokens = token[1:-1]
+    n_items = len(sub_tokens)
+    while isinstance(sub_tokens[n_items - 1], _Condition):
+        n_items -= 1
+    return _ListNode(
+        items=tuple(_compile_token(t) for t in sub_tokens[:n_items]),
+        conditions=tuple(
+            _ConditionNode(c.op, _compile_token(c.arg))
+            for c in sub_tokens[n_items:]
+        ),
+        slice=_slice,
+    )
+
+
+@dataclass(frozen=True, slots=True, repr=False)
+class CompiledFolderSpec:
+    """A folder specification compiled into an immutable syntax tree.
+
+    Instances should be obtained via :func:`compile_folder_spec`. They can be
+    evaluated against any number of different `groups`. Two instances are
+    equal if they have the same syntax tree, even if the original `spec`
+    differs (e.g., in whitespace).
+
+    Attributes:
+        spec (str): The original folder specification
+        items (tuple): The top-level nodes of the syntax tree
+    """
+
+    spec: str = field(compare=False)
+    items: tuple
+
+    def __post_init__(self):
+        object.__setattr__(self, 'items', tuple(self.items))
+
+    def __repr__(self):
+        return "<CompiledFolderSpec(%r)>" % self.spec
+
+    def evaluate(self, groups, *, sort_key=None, engine='list'):
+        """Convert the specification into a list of folder names.
+
+        Args:
+            groups (dict): map of group name to list of folders in group
+            sort_key (None or callable): map of folder name to sortable
+                object. If None, sorting will be done according to PEP440
+            engine (str): The evaluation engine, one of the keys in
+                :data:`ENGINES`. The default ``'list'`` engine is the
+                reference implementation.
+
+        Raises:
+            ValueError: if the specification references a group that is not
+                in `groups`, or if `engine` is unknown.
+        """
+        resolver = BatchResolver(groups, sort_key=sort_key, engine=engine)
+        return resolver.resolve(self)
+
+
+def compile_folder_spec(
+    spec, group_names=None, *, max_length=None, max_depth=None
+):
+    """Compile a folder specification.
+
+    Args:
+        spec (str): folder specification
+        group_names (None or iterable[str]): The names of the groups that may
+            be referenced in `spec`. If given, any other group name is a
+            syntax error. If None, any group name is accepted, and unknown
+            group names are only detected when the compiled specification is
+            evaluated.
+        max_length (None or int): The maximum number of characters in `spec`.
+            If None, use :data:`MAX_SPEC_LENGTH`.
+        max_depth (None or int): The maximum nesting depth of parentheses in
+            `spec`. If None, use :data:`MAX_NESTING_DEPTH`.
 
     Returns:
-        list: list of parsed tokens
+        CompiledFolderSpec: compiled specification.
 
     Raises:
-        ValueError: if `spec` cannot be parsed.
+        ValueError: if `spec` cannot be parsed, or exceeds `max_length` or
+            `max_depth`.
+
+    Compilation takes time linear in the length of `spec`. Compiled
+    specifications are cached, so compiling the same `spec` (for the same
+    `group_names`) is free.
+    """
+    if group_names is not None:
+        group_names = tuple(group_names)
+    if max_length is None:
+        max_length = MAX_SPEC_LENGTH
+    if max_depth is None:
+        max_depth = MAX_NESTING_DEPTH
+    return _compile_folder_spec(spec, group_names, max_length, max_depth)
+
+
+@lru_cache(maxsize=_PARSE_CACHE_SIZE)
+def _compile_folder_spec(spec, group_names, max_length, max_depth):
+    """Cached implementation of :func:`compile_folder_spec`."""
+    tokens = _parse_folder_spec(spec, group_names, max_length, max_depth)
+    return CompiledFolderSpec(spec, (_compile_token(t) for t in tokens))
+
+
+def resolve_folder_spec(spec, groups, *, sort_key=None, engine='list'):
+    """Convert folder specification into list of folder names.
+
+    Args:
+        spec (str): folder specification
+        groups (dict): map of group name to list of folders in group
+        sort_key (None or callable): map of folder name to sortable object. If
+            None, sorting will be done according to PEP440
+        engine (str): The evaluation engine, see
+            :meth:`CompiledFolderSpec.evaluate`.
     """
-    group_names = list(groups.keys())
+    compiled = compile_folder_spec(spec, group_names=groups.keys())
+    return compiled.evaluate(groups, sort_key=sort_key, engine=engine)
+
+
+# Conditions that reduce to a single comparison with the lowest, respectively
+# highest version in the list of operands. As the filters are partials with
+# the bound as the *first* argument, the comparison operators are reversed,
+# e.g., ``version < bound`` is ``operator.gt(bound, version)``.
+_LOWER_BOUND_OPS = {'<': operator.gt, '<=': operator.ge}
+_UPPER_BOUND_OPS = {'>': operator.lt, '>=': operator.le}
+
+
+# Conditions that select a contiguous range of a sorted VersionIndex
+_RANGE_OPS = ('<', '<=', '>', '>=', '==')
+
+
+def _condition_filter(op, versions):
+    """Return a filter for the condition `op` w.r.t. the given `versions`.
+
+    The returned filter takes a single argument `version` (the sort key of a
+    folder name in a :class:`.SortKeyTable`, or the result of
+    :func:`parse_version`) and returns True if the `version` passes the
+    condition, that is, if ``version <op> v`` for all `v` in `versions`.
+    Each condition is reduced to a single comparison with a bound,
+    respectively a set lookup.
+    """
+    if op in ('in', 'not in', '!='):
+        keys = frozenset(versions)
+        if op == 'in':
+            return keys.__contains__
+        return lambda version: version not in keys
+    if len(versions) == 0:
+        return lambda version: True  # `all` of an empty list
+    if op in _LOWER_BOUND_OPS:
+        return partial(_LOWER_BOUND_OPS[op], min(versions))
+    elif op in _UPPER_BOUND_OPS:
+        return partial(_UPPER_BOUND_OPS[op], max(versions))
+    elif op == '==':
+        if len(set(versions)) > 1:
+            return lambda version: False
+        return partial(operator.eq, versions[0])
+    else:  # pragma: nocover
+        raise ValueError("Unknown operator: %r" % op)
+
+
+def _condition_index_range(index, op, versions):
+    """Return the ``(start, stop)`` range of `index` that passes a condition.
+
+    This is equivalent to :func:`_condition_filter` for any `op` in
+    `_RANGE_OPS`, for a :class:`.VersionIndex` sorted according to PEP440.
+    """
+    if len(versions) == 0:
+        return 0, len(index)  # `all` of an empty list
+    if op == '<':
+        return index.index_range(upper=min(versions), upper_inclusive=False)
+    elif op == '<=':
+        return index.index_range(upper=min(versions))
+    elif op == '>':
+        return index.index_range(lower=max(versions), lower_inclusive=False)
+    elif op == '>=':
+        return index.index_range(lower=max(versions))
+    elif op == '==':
+        if len(set(versions)) > 1:
+            return 0, 0
+        return index.index_range(lower=versions[0], upper=versions[0])
+    else:  # pragma: nocover
+        raise ValueError("Not a range operator: %r" % op)
+
+
+class _BaseResolver:
+    """Evaluation of compiled specifications against a specific `groups`.
+
+    A resolver may be used to resolve any number of specifications. The
+    result of every sub-expression is cached, so that identical
+    sub-expressions (compiled to equal nodes) are evaluated only once.
+
+    Subclasses must implement :meth:`resolve_spec_items`.
+    """
+
+    def __init__(self, groups, sort_key):
+        self.groups = groups
+        if sort_key is parse_version:
+            # same order, but faster (shared with a GroupTable, if possible)
+            sort_key = getattr(groups, 'sort_keys', None)
+            if sort_key is None:
+                sort_key = SortKeyTable()
+        self.sort_key = sort_key
+        # Whether `sort_key` sorts according to PEP440, so that sorted groups
+        # are also sorted w.r.t. conditions
+        self.pep440 = isinstance(sort_key, SortKeyTable)
+        # Map of folder names to versions, for conditions
+        self.version_key = sort_key if self.pep440 else SortKeyTable()
+        self.spec = ''  # for error messages
+        self._group_names = {name.lower(): name for name in groups}
+        self._cache = {}
+
+    def cached(self, kind, node, compute):
+        """Return ``compute(node)``, evaluated only once for every `node`.
 
-    def convert_to_slice(parse_string, loc, tokens):
-        """Convert SliceSpec tokens to slice instance."""
-        parts = "".join(tokens[1:-1]).split(':')
-        if len(parts) == 1:
-            i = int(parts[0])
-            if i == -1:
-                return slice(i, None, None)
+        The `kind` distinguishes the different values that may be computed
+        for the same node. Cached values must not be modified.
+        """
+        try:
+            return self._cache[kind, node]
+        except KeyError:
+            value = compute(node)
+            self._cache[kind, node] = value
+            return value
+
+    def group_key(self, name):
+        """Return the key in `groups` for the group `name` (case-insensitive).
+
+        Raises:
+            ValueError: if there is no such group.
+        """
+        if name in self.groups:
+            return name
+        try:
+            return self._group_names[name.lower()]
+        except KeyError:
+            raise ValueError(
+                "Invalid specification %r: unknown group <%s>"
+                % (self.spec, name)
+            )
+
+    def is_sorted(self, group):
+        """Whether the `group` (a value in `groups`) is sorted.
+
+        This is the case for a :class:`.VersionIndex` that is sorted in the
+        same order as the `sort_key`.
+        """
+        if not isinstance(group, VersionIndex):
+            return False
+        if self.pep440:
+            return isinstance(group.sort_key, SortKeyTable)
+        return group.sort_key is self.sort_key
+
+    def resolve(self, compiled):
+        """Resolve a :class:`CompiledFolderSpec` into a list of folders."""
+        self.spec = compiled.spec
+        folders = self.cached('spec', compiled.items, self.resolve_spec_items)
+        return list(folders)  # copy, as cached values must not be modified
+
+    def resolve_spec_items(self, items):
+        """Resolve the top-level `items` of a compiled specification.
+
+        Returns:
+            list[str]: list of folder names
+        """
+        raise NotImplementedError()
+
+
+# Maximum number of items in a slice for which the items are selected via a
+# heap instead of sorting all items
+_TOP_K_LIMIT = 32
+
+
+def _top_k(_slice):
+    """Analyze a (start, stop, step) `_slice` for top-k selection.
+
+    If applying the `_slice` to a sorted list only requires the `k` largest
+    (first element of the result is True) or the `k` smallest (first element
+    False) items, for a small `k`, return a tuple ``(largest, k)``. In this
+    case, applying the slice to the sorted `k` largest/smallest items gives
+    the same result as applying it to the full sorted list. Otherwise, return
+    None.
+    """
+    start, stop, step = _slice
+    if step not in (None, 1):
+        return None
+    if start is not None and start < 0:
+        if stop is None or stop < 0:
+            k = -start  # the slice only reaches back `k` items from the end
+            largest = True
+        else:
+            return None
+    elif stop is not None and stop >= 0:
+        k = stop  # the slice ends at `stop`, counted from the start
+        largest = False
+    else:
+        return None
+    if k > _TOP_K_LIMIT:
+        return None
+    return largest, k
+
+
+class _Resolver(_BaseResolver):
+    """Reference evaluation of compiled specifications, based on lists."""
+
+    def __init__(self, groups, sort_key):
+        super().__init__(groups, sort_key)
+        self._indices = {}
+        self._all = None
+
+    def resolve_spec_items(self, items):
+        return self.resolve_items(items)
+
+    def group(self, name):
+        """Return the folders in the group `name` (case-insensitive).
+
+        The result is a :class:`.VersionIndex` that is sorted according to
+        the `sort_key`. It is created only once for each group, or taken
+        directly from `groups` if the group is already sorted (see
+        :func:`.get_group_table`).
+        """
+        try:
+            return self._indices[name]
+        except KeyError:
+            key = self.group_key(name)
+            index = self.groups[key]
+            if not self.is_sorted(index):
+                index = VersionIndex(index, sort_key=self.sort_key)
+            self._indices[name] = index
+            return index
+
+    def exists(self, folder):
+        """Check whether `folder` is in the 'all' group."""
+        if self._all is None:
+            self._all = frozenset(self.groups['all'])
+        return folder in self._all
+
+    def resolve_items(self, items):
+        """Resolve a sequence of nodes into a list of folder names."""
+        # Duplicates are dropped as we go, so that the total work is linear
+        # in the number of items plus the size of the resolved groups
+        folders = OrderedDict()
+        for node in items:
+            if isinstance(node, _FolderNode):
+                if self.exists(node.name):
+                    folders.setdefault(node.name)
+            elif isinstance(node, _GroupNode):
+                if len(folders) == 0:
+                    folders.update(dict.fromkeys(self.group(node.name)))
+                else:
+                    for folder in self.group(node.name):
+                        folders.setdefault(folder)
+            elif isinstance(node, _ListNode):
+                for folder in self.resolve_list(node):
+                    folders.setdefault(folder)
+            else:  # pragma: no cover
+                raise TypeError(
+                    "Unexpected folder specification node: %r" % node
+                )
+        return list(folders)
+
+    def resolve_list(self, node):
+        """Resolve a :class:`_ListNode` into a list of folder names."""
+        return self.cached('list', node, self._resolve_list)
+
+    def _resolve_list(self, node):
+        if self._is_top_k_query(node):
+            return self.resolve_top_k_query(node)
+        if self._is_range_query(node):
+            return self.resolve_range_query(node)
+        folders = self.filter_folders(
+            self.resolve_items(node.items), node.conditions
+        )
+        if node.slice is None:
+            return sorted(folders, key=self.sort_key)
+        else:
+            return folders[slice(*node.slice)]
+
+    def filter_folders(self, folders, conditions):
+        """Return the list of `folders` that pass all `conditions`."""
+        if len(conditions) == 0:
+            return folders
+        filters = [
+            _condition_filter(c.op, self.condition_versions(c))
+            for c in conditions
+        ]
+        version_key = self.version_key
+        return [
+            folder
+            for folder in folders
+            if all(filter(version_key(folder)) for filter in filters)
+        ]
+
+    def _is_top_k_query(self, node):
+        """Whether `node` can be resolved via :meth:`resolve_top_k_query`."""
+        return (
+            node.slice is not None
+            and len(node.items) == 1
+            and isinstance(node.items[0], _GroupNode)
+            and node.items[0].name not in self._indices  # not yet sorted
+            and not self.is_sorted(self.groups.get(node.items[0].name))
+            and _top_k(node.slice) is not None
+        )
+
+    def resolve_top_k_query(self, node):
+        """Resolve a :class:`_ListNode` selecting few items from a group.
+
+        For slices like ``(<public-releases>)[-1]`` or ``(<releases>)[:5]``
+        of a group that has not been sorted yet, only the `k` largest (or
+        smallest) folders are selected via a heap, in :math:`O(n \\log k)`
+        instead of sorting the entire group. Conditions are applied to the
+        (unsorted) group first.
+        """
+        name = self.group_key(node.items[0].name)
+        folders = self.filter_folders(
+            list(dict.fromkeys(self.groups[name])), node.conditions
+        )
+        _slice = slice(*node.slice)
+        largest, k = _top_k(node.slice)
+        sort_key = self.sort_key
+
+        # Sorting by (sort_key, original position) exactly reproduces the
+        # stable sort of all folders, for folders with equal sort keys
+        def key(item):
+            return (sort_key(item[1]), item[0])
+
+        if largest:
+            selected = heapq.nlargest(k, enumerate(folders), key=key)
+            selected.reverse()
+        else:
+            selected = heapq.nsmallest(k, enumerate(folders), key=key)
+        return [folder for (_, folder) in selected][_slice]
+
+    def _is_range_query(self, node):
+        """Whether `node` can be resolved via :meth:`resolve_range_query`."""
+        return (
+            self.pep440
+            and len(node.items) == 1
+            and isinstance(node.items[0], _GroupNode)
+            and any(c.op in _RANGE_OPS for c in node.conditions)
+        )
+
+    def resolve_range_query(self, node):
+        """Resolve a :class:`_ListNode` for a group with range conditions.
+
+        Range conditions like ``(<releases> >= 1.0 < 2.0)`` are evaluated by
+        bisecting the sorted group, and only the remaining conditions (e.g.
+        ``in``) are applied to the folders within the range.
+        """
+        index = self.group(node.items[0].name)
+        start, stop = 0, len(index)
+        filters = []
+        for condition in node.conditions:
+            versions = self.condition_versions(condition)
+            if condition.op in _RANGE_OPS:
+                _start, _stop = _condition_index_range(
+                    index, condition.op, versions
+                )
+                start, stop = max(start, _start), min(stop, _stop)
             else:
-                return slice(i, i + 1, None)
+                filters.append(_condition_filter(condition.op, versions))
+        folders = index.folders[start:stop]
+        if len(filters) > 0:
+            keys = index.keys[start:stop]
+            folders = [
+                folder
+                for (folder, version) in zip(folders, keys)
+                if all(filter(version) for filter in filters)
+            ]
         else:
-            parts += [''] * (3 - len(parts))  # pad to length 3
-            start, stop, step = (int(v) if len(v) > 0 else None for v in parts)
-            return slice(start, stop, step)
+            folders = list(folders)
+        if node.slice is None:
+            return folders  # already sorted
+        else:
+            return folders[slice(*node.slice)]
+
+    def condition_versions(self, condition):
+        """Return the parsed versions for the operand of a condition."""
+        return self.cached(
+            'operand', condition.operand, self._operand_versions
+        )
+
+    def _operand_versions(self, operand):
+        if isinstance(operand, _FolderNode):
+            return [self.version_key(operand.name)]
+        else:
+            return [
+                self.version_key(v) for v in self.resolve_items((operand,))
+            ]
+
+
+def _mask_from_positions(positions, n):
+    """Return an integer bitmask with the given bit `positions` set.
+
+    The mask is built in :math:`O(n)`, via a string of `n` binary digits.
+    """
+    if n == 0:
+        return 0
+    bits = bytearray(b'0' * n)
+    for pos in positions:
+        bits[n - 1 - pos] = 49  # ord('1')
+    return int(bits, 2)
+
+
+def _positions_from_mask(mask):
+    """Return the list of positions of all bits set in `mask`, ascending."""
+    bits = bin(mask)[:1:-1]  # strip '0b' and reverse: bits[i] is bit i
+    positions = []
+    pos = bits.find('1')
+    while pos >= 0:
+        positions.append(pos)
+        pos = bits.find('1', pos + 1)
+    return positions
+
+
+def _range_mask(start, stop):
+    """Return a bitmask with all bits in ``range(start, stop)`` set."""
+    if stop <= start:
+        return 0
+    return ((1 << (stop - start)) - 1) << start
+
+
+class _BitsetResolver(_BaseResolver):
+    """Evaluation of compiled specifications based on integer bitmasks.
+
+    Every folder that appears in any of the `groups` is assigned an integer
+    position in the order defined by `sort_key`. Any set of folders that is
+    sorted in that order (groups, and the results of parenthesized lists
+    without a slice) is then represented by an integer with the bits at the
+    positions of the folders set. Unions, removal of duplicates, and
+    conditions become bit operations. Only results whose order cannot be
+    expressed as a bitmask (e.g. reversed slices, or unsorted comma-separated
+    items) are represented as lists of folder names.
+
+    The results are identical to those of :class:`_Resolver`, except for the
+    relative order of distinct folders that sort as equal (e.g. "v1.0" and
+    "1.0.0").
+    """
+
+    def __init__(self, groups, sort_key):
+        super().__init__(groups, sort_key)
+        all_folders = groups.get('all')
+        if self.is_sorted(all_folders) and all(
+            all(folder in all_folders for folder in folders)
+            for folders in groups.values()
+        ):
+            self.index = all_folders
+        else:
+            universe = set()
+            for folders in groups.values():
+                universe.update(folders)
+            self.index = VersionIndex(universe, sort_key=self.sort_key)
+        self.folders = self.index.folders
+        self.positions = {f: i for (i, f) in enumerate(self.folders)}
+        self.full_mask = _range_mask(0, len(self.folders))
+        self._masks = {}
+        self._all_mask = None
+        self._versions = None
+        self._version_positions = None
+
+    def resolve_spec_items(self, items):
+        result = self.resolve_items(items)
+        if isinstance(result, int):
+            return self.folders_from_mask(result)
+        return result
 
-    def convert_to_callable_filter(parse_string, loc, tokens):
-        """Convert ConditionSpec to a callable filter.
+    def folders_from_mask(self, mask):
+        """Return the list of folders in `mask`, in sorted order."""
+        folders = self.folders
+        return [folders[pos] for pos in _positions_from_mask(mask)]
 
-        The returned filter takes a single argument `folder` and return True if
-        the `folder` passes the filter.
+    def mask_from_folders(self, folders):
+        """Return the bitmask for the given `folders`."""
+        positions = self.positions
+        return _mask_from_positions(
+            (positions[f] for f in folders), len(self.folders)
+        )
+
+    @property
+    def versions(self):
+        """Tuple of the versions of all folders, by position.
+
+        The versions are the keys in the :attr:`version_key` table.
+        """
+        if self._versions is None:
+            if self.pep440:
+                self._versions = self.index.keys
+            else:
+                version_key = self.version_key
+                self._versions = tuple(version_key(f) for f in self.folders)
+        return self._versions
+
+    def group_mask(self, name):
+        """Return the bitmask for the group `name`."""
+        try:
+            return self._masks[name]
+        except KeyError:
+            key = self.group_key(name)
+            mask = self.mask_from_folders(self.groups[key])
+            self._masks[name] = mask
+            return mask
+
+    def folder_mask(self, folder):
+        """Return the bitmask for `folder` (zero if it does not exist)."""
+        if self._all_mask is None:
+            self._all_mask = self.mask_from_folders(self.groups['all'])
+        pos = self.positions.get(folder)
+        if pos is None:
+            return 0
+        return (1 << pos) & self._all_mask
+
+    def resolve_node(self, node):
+        """Resolve a single node into a bitmask or a list of folder names."""
+        if isinstance(node, _FolderNode):
+            return self.folder_mask(node.name)
+        elif isinstance(node, _GroupNode):
+            return self.group_mask(node.name)
+        elif isinstance(node, _ListNode):
+            return self.resolve_list(node)
+        else:  # pragma: no cover
+            raise TypeError("Unexpected folder specification node: %r" % node)
+
+    def resolve_items(self, items):
+        """Resolve a sequence of nodes into a bitmask or a list of folders.
+
+        If there are multiple `items`, the result is a list of folders, in the
+        order of the `items`.
         """
-        op, arg = tokens[0], tokens[1]
-
-        def _filter(folder, _op, _list):
-            folder = parse_version(folder)
-            _list = [parse_version(v) for v in _list]
-            if _op == 'in':
-                return folder in _list
-            elif _op == 'not in':
-                return folder not in _list
-            elif _op == '<=':
-                return all([folder <= v for v in _list])
-            elif _op == '<':
-                return all([folder < v for v in _list])
-            elif _op == '==':
-                return all([folder == v for v in _list])
-            elif _op == '!=':
-                return all([folder != v for v in _list])
-            elif _op == '>=':
-                return all([folder >= v for v in _list])
-            elif _op == '>':
-                return all([folder > v for v in _list])
-            else:  # pragma: nocover
-                raise ValueError("Unknown operator: %r" % _op)
-
-        if isinstance(arg, str):
-            _list = [arg]
+        if len(items) == 1:
+            return self.resolve_node(items[0])
+        folders = []
+        seen = 0
+        for node in items:
+            result = self.resolve_node(node)
+            if isinstance(result, int):
+                folders.extend(self.folders_from_mask(result & ~seen))
+                seen |= result
+            else:
+                mask = self.mask_from_folders(result)
+                new = set(_positions_from_mask(mask & ~seen))
+                for folder in result:
+                    pos = self.positions[folder]
+                    if pos in new:
+                        folders.append(folder)
+                        new.remove(pos)
+                seen |= mask
+        return folders
+
+    def resolve_list(self, node):
+        """Resolve a :class:`_ListNode` into a bitmask or list of folders."""
+        return self.cached('list', node, self._resolve_list)
+
+    def _resolve_list(self, node):
+        result = self.resolve_items(node.items)
+        if len(node.conditions) > 0:
+            condition_mask = self.full_mask
+            for condition in node.conditions:
+                condition_mask &= self.condition_mask(condition)
+            if isinstance(result, int):
+                result &= condition_mask
+            else:
+                positions = self.positions
+                result = [
+                    folder
+                    for folder in result
+                    if (condition_mask >> positions[folder]) & 1
+                ]
+        if node.slice is None:
+            if isinstance(result, int):
+                return result
+            return self.mask_from_folders(result)
         else:
-            _list = _resolve_folder_spec(
-                [arg.asList()], groups, sort_key=sort_key
+            _slice = slice(*node.slice)
+            if isinstance(result, int):
+                positions = _positions_from_mask(result)[_slice]
+                if _slice.step is None or _slice.step > 0:
+                    return _mask_from_positions(positions, len(self.folders))
+                folders = self.folders
+                return [folders[pos] for pos in positions]
+            return result[_slice]
+
+    def condition_versions(self, condition):
+        """Return the parsed versions for the operand of a condition."""
+        if isinstance(condition.operand, _FolderNode):
+            return [self.version_key(condition.operand.name)]
+        result = self.resolve_node(condition.operand)
+        if isinstance(result, int):
+            versions = self.versions
+            return [versions[pos] for pos in _positions_from_mask(result)]
+        return [self.version_key(folder) for folder in result]
+
+    def condition_mask(self, condition):
+        """Return the bitmask of all folders that pass `condition`."""
+        return self.cached('condition', condition, self._condition_mask)
+
+    def _condition_mask(self, condition):
+        op = condition.op
+        versions = self.condition_versions(condition)
+        if op in ('in', 'not in', '!='):
+            if self._version_positions is None:
+                self._version_positions = {}
+                for pos, version in enumerate(self.versions):
+                    self._version_positions.setdefault(version, []).append(pos)
+            positions = []
+            for version in set(versions):
+                positions.extend(self._version_positions.get(version, []))
+            mask = _mask_from_positions(positions, len(self.folders))
+            if op == 'in':
+                return mask
+            return self.full_mask & ~mask
+        elif self.pep440:
+            start, stop = _condition_index_range(self.index, op, versions)
+            return _range_mask(start, stop)
+        else:
+            _filter = _condition_filter(op, versions)
+            return _mask_from_positions(
+                (
+                    pos
+                    for (pos, version) in enumerate(self.versions)
+                    if _filter(version)
+                ),
+                len(self.folders),
             )
-        return partial(_filter, _op=op, _list=_list)
-
-    Int = Word(nums + "-", nums)
-    Colon = Literal(':')
-
-    SliceSpec = (
-        "["
-        + Optional(Int)
-        + Optional(Colon + Optional(Int))
-        + Optional(Colon + Optional(Int))
-        + "]"
-    ).set_parse_action(convert_to_slice)
-
-    LogicalOperator = (
-        Literal('in')
-        | Literal('not in')
-        | Literal('<=')
-        | Literal('<')
-        | Literal('==')
-        | Literal('!=')
-        | Literal('>=')
-        | Literal('>')
-    )
 
-    GroupName = Group("<" + one_of(group_names, caseless=True) + ">")
-    FolderName = Word(alphanums, alphanums + ".-_+")
 
-    ParenthesizedListSpec = Forward()
-    ConditionSpec = Forward()
+#: Map of engine names to resolver classes, for
+#: :meth:`CompiledFolderSpec.evaluate`
+ENGINES = {'list': _Resolver, 'bitset': _BitsetResolver}
 
-    ParenthesizedListSpec <<= Group(
-        "("
-        + DelimitedList(GroupName | FolderName | ParenthesizedListSpec)
-        + ZeroOrMore(ConditionSpec)
-        + ")"
-        + Optional(SliceSpec)
-    )
 
-    ConditionSpec <<= LogicalOperator + (
-        FolderName | GroupName | ParenthesizedListSpec
-    )
-    ConditionSpec = ConditionSpec.set_parse_action(convert_to_callable_filter)
+class BatchResolver:
+    """Resolver for many folder specifications against the same `groups`.
 
-    ListSpec = DelimitedList(GroupName | FolderName | ParenthesizedListSpec)
+    Args:
+        groups (dict): map of group name to list of folders in group
+        sort_key (None or callable): map of folder name to sortable object. If
+            None, sorting will be done according to PEP440, via a
+            :class:`.SortKeyTable`. Passing a :class:`.SortKeyTable` allows
+            to share the sort keys between several resolvers.
+        engine (str): The evaluation engine, see
+            :meth:`CompiledFolderSpec.evaluate`.
 
-    Spec = ListSpec | ParenthesizedListSpec
+    All specifications resolved through the same :class:`BatchResolver` share
+    the sorted groups and the results of all sub-expressions. Identical
+    sub-expressions, e.g. ``(<public-releases>)[-1]`` appearing in several
+    specifications, are evaluated only once. The `groups` must not be
+    modified while the :class:`BatchResolver` is in use.
+    """
 
-    if spec.strip() == '':
-        return []
-    try:
-        return Spec.parse_string(spec, parse_all=True).as_list()
-    except ParseException as exc:
-        raise ValueError(
-            "Invalid specification (marked '*'): %r" % exc.mark_input_line('*')
-        )
+    def __init__(self, groups, *, sort_key=None, engine='list'):
+        if sort_key is None:
+            sort_key = parse_version
+        try:
+            resolver_cls = ENGINES[engine]
+        except KeyError:
+            raise ValueError(
+                "Unknown engine %r: must be one of %s"
+                % (engine, ", ".join(repr(name) for name in ENGINES))
+            )
+        self.groups = groups
+        self._group_names = tuple(groups.keys())
+        self._resolver = resolver_cls(groups, sort_key)
 
+    def resolve(self, spec):
+        """Convert folder specification into list of folder names.
 
-def resolve_folder_spec(spec, groups, *, sort_key=None):
-    """Convert folder specification into list of folder names.
+        Args:
+            spec (str or CompiledFolderSpec): folder specification
+        """
+        if not isinstance(spec, CompiledFolderSpec):
+            spec = compile_folder_spec(spec, self._group_names)
+        return self._resolver.resolve(spec)
+
+    def resolve_all(self, specs):
+        """Convert multiple folder specifications into lists of folder names.
+
+        Args:
+            specs (iterable): folder specifications (strings or
+                :class:`CompiledFolderSpec` instances)
+
+        Returns:
+            list[list[str]]: list of folder names for each spec
+        """
+        return [self.resolve(spec) for spec in specs]
+
+
+def resolve_folder_specs(specs, groups, *, sort_key=None, engine='list'):
+    """Convert multiple folder specifications into lists of folder names.
+
+    This is equivalent to calling :func:`resolve_folder_spec` for each of the
+    `specs`, but evaluates any sub-expression shared between the `specs` only
+    once, see :class:`BatchResolver`.
+
+    Returns:
+        list[list[str]]: list of folder names for each spec
+    """
+    resolver = BatchResolver(groups, sort_key=sort_key, engine=engine)
+    return resolver.resolve_all(specs)
+
+
+def _format_slice(_slice):
+    """Format a (start, stop, step) tuple in the notation of a spec."""
+    start, stop, step = _slice
+    if step is None and start is not None:
+        if (start == -1 and stop is None) or (stop == start + 1 != 0):
+            return '[%d]' % start
+    parts = ['' if val is None else str(val) for val in (start, stop)]
+    if step is not None:
+        parts.append(str(step))
+    return '[%s]' % ':'.join(parts)
+
+
+def _format_node(node):
+    """Format a node of a compiled specification as a spec string."""
+    if isinstance(node, _FolderNode):
+        return node.name
+    elif isinstance(node, _GroupNode):
+        return '<%s>' % node.name
+    elif isinstance(node, _ConditionNode):
+        return '%s %s' % (node.op, _format_node(node.operand))
+    text = ', '.join(_format_node(item) for item in node.items)
+    for condition in node.conditions:
+        text += ' ' + _format_node(condition)
+    text = '(%s)' % text
+    if node.slice is not None:
+        text += _format_slice(node.slice)
+    return text
+
+
+def _format_folders(folders, max_folders):
+    """Format a list of folders, eliding the middle if there are too many."""
+    if len(folders) > max_folders:
+        n_head = max_folders // 2
+        n_tail = max_folders - n_head
+        folders = [*folders[:n_head], '...', *folders[-n_tail:]]
+    return ', '.join(folders)
+
+
+def explain_folder_spec(spec, groups, *, sort_key=None, max_folders=6):
+    """Explain how a folder specification is evaluated.
 
     Args:
         spec (str): folder specification
         groups (dict): map of group name to list of folders in group
         sort_key (None or callable): map of folder name to sortable object. If
             None, sorting will be done according to PEP440
+        max_folders (int): The maximum number of folders to show for each
+            node. Longer results are abbreviated.
+
+    Returns:
+        str: A multi-line report of the syntax tree of `spec`. For every node,
+        the report shows the number of resulting folders, the time it takes
+        to evaluate the node, and the resulting folders. For conditions, the
+        number of folders is that of the items of the enclosing parenthesized
+        list that pass the condition.
+
+    Every node is evaluated on its own, with the reference ``'list'`` engine
+    and without sharing any sorted groups or cached sub-expressions. The times
+    are therefore inclusive of all child nodes, and show the cost of
+    evaluating the node from scratch.
     """
     if sort_key is None:
         sort_key = parse_version
-    spec_list = _parse_folder_spec(spec, groups, sort_key=sort_key)
-    return _resolve_folder_spec(spec_list, groups, sort_key)
-
-
-def _resolve_folder_spec(spec_list, groups, sort_key):
-    """Recursively implement :func:`resolve_folder_spec`.
-
-    Compared to :func:`resolve_folder_spec`, this receives a list of parsed
-    tokens `spec_list` (as returned by :func:`_parse_folder_spec`) instead of a
-    single string `spec`.
-    """
-    folders = []
-    for item in spec_list:
-        if isinstance(item, str):
-            if item in groups['all']:
-                folders.append(item)
-        elif isinstance(item, list):
-            if item[0] == '<':
-                existing = set(folders)
-                name = item[1]
-                for folder in sorted(groups[name], key=sort_key):
-                    if folder not in existing:
-                        folders.append(folder)
-            elif item[0] == '(':
-                if isinstance(item[-1], slice):
-                    _slice = item[-1]
-                    sub_specs = item[1:-2]
-                    _sort_if_no_slice = lambda v: 0  # do not sort
-                else:  # no slice
-                    _slice = slice(None)
-                    sub_specs = item[1:-1]
-                    _sort_if_no_slice = sort_key
-                filters = []
-                while callable(sub_specs[-1]):
-                    filters.append(sub_specs.pop())
-                folders.extend(
-                    sorted(
-                        [
-                            folder
-                            for folder in _resolve_folder_spec(
-                                sub_specs, groups, sort_key
-                            )
-                            if all(filter(folder) for filter in filters)
-                        ],
-                        key=_sort_if_no_slice,
-                    )[_slice]
-                )
-        else:  # pragma: no cover
-            # it should be impossible to get here, assuming a correct parser
-            raise TypeError("Unexpected folder specification item: %r" % item)
-    return list(OrderedDict.fromkeys(folders))  # remove duplicates
+    compiled = compile_folder_spec(spec, group_names=groups.keys())
+    lines = []
+
+    def add_line(depth, text, folders, seconds):
+        n = len(folders)
+        lines.append(
+            "%s%s  [%d folder%s, %.3f ms]: %s"
+            % (
+                '  ' * depth,
+                text,
+                n,
+                '' if n == 1 else 's',
+                1000 * seconds,
+                _format_folders(folders, max_folders),
+            )
+        )
+
+    def timed(evaluate, *args):
+        resolver = _Resolver(groups, sort_key)
+        resolver.spec = spec
+        start = time.perf_counter()
+        folders = evaluate(resolver, *args)
+        return folders, time.perf_counter() - start
+
+    def explain_node(node, depth):
+        if isinstance(node, _ListNode):
+            folders, seconds = timed(_Resolver.resolve_list, node)
+        else:
+            folders, seconds = timed(_Resolver.resolve_items, (node,))
+        add_line(depth, _format_node(node), folders, seconds)
+        if isinstance(node, _ListNode):
+            explain_list_items(node, depth + 1)
+
+    def explain_list_items(node, depth):
+        for item in node.items:
+            explain_node(item, depth)
+        for condition in node.conditions:
+            explain_condition(condition, node.items, depth)
+
+    def explain_condition(condition, items, depth):
+        def evaluate(resolver):
+            filter = _condition_filter(
+                condition.op, resolver.condition_versions(condition)
+            )
+            return [
+                folder
+                for folder in resolver.resolve_items(items)
+                if filter(resolver.version_key(folder))
+            ]
+
+        folders, seconds = timed(evaluate)
+        add_line(depth, _format_node(condition), folders, seconds)
+        if not isinstance(condition.operand, _FolderNode):
+            explain_node(condition.operand, depth + 1)
+
+    folders, seconds = timed(_Resolver.resolve, compiled)
+    add_line(0, spec.strip(), folders, seconds)
+    if len(compiled.items) > 1:
+        for node in compiled.items:
+            explain_node(node, 1)
+    elif len(compiled.items) == 1 and isinstance(compiled.items[0], _ListNode):
+        # The first line already shows the single parenthesized list
+        explain_list_items(compiled.items[0], 1)
+    return "\n".join(lines)
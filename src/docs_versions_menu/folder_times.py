@@ -0,0 +1,182 @@
+"""Deployment times of folders, and time-based groups.
+
+The groups ``<older-than:N[smhdw]>`` and ``<newer-than:N[smhdw]>`` contain
+all folders whose last deployment (the most recent git commit touching the
+folder) is older, respectively newer, than ``N`` seconds, minutes, hours,
+days, or weeks.
+"""
+
+import logging
+import re
+import subprocess
+import time
+from functools import lru_cache
+from pathlib import Path
+
+# Name of a time-based group, e.g. "older-than:180d"
+_RX_TIME_GROUP = re.compile(
+    r'(?P<relation>older|newer)-than:(?P<amount>\d+)(?P<unit>[smhdw])',
+    re.IGNORECASE,
+)
+
+# Time-based group names referenced in a folder specification
+_RX_TIME_GROUP_REF = re.compile(
+    r'<\s*(' + _RX_TIME_GROUP.pattern + r')\s*>', re.IGNORECASE
+)
+
+_SECONDS_PER_UNIT = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def time_group_names(specs):
+    """Return a list of the time-based group names referenced in `specs`.
+
+    Args:
+        specs (iterable[str]): folder specifications
+
+    The names are returned in lower case, without duplicates.
+    """
+    names = {}
+    for spec in specs:
+        for match in _RX_TIME_GROUP_REF.finditer(spec):
+            names[match.group(1).lower()] = None
+    return list(names)
+
+
+def _git_head(root):
+    """Return the HEAD commit of the git repository at `root`, or None."""
+    proc = subprocess.run(
+        ['git', 'rev-parse', '--verify', '--quiet', 'HEAD'],
+        cwd=root,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        universal_newlines=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        return None
+    return proc.stdout.strip()
+
+
+def get_folder_times(folders=None, root='.'):
+    """Get the time of the last commit for every top-level folder.
+
+    Args:
+        folders (None or iterable[str]): If given, stop reading the git
+            history as soon as the times for all `folders` are known. If any
+            of the `folders` was never committed (e.g., the folder for a new
+            version that is being deployed), the entire history is read.
+        root (str or Path): The root of the git repository (the gh-pages
+            branch)
+
+    Returns:
+        dict: map of folder names to the unix time of the most recent commit
+        that touched any file in the folder. Folders without any commit are
+        not included.
+
+    The times for all folders are obtained from a single ``git log
+    --name-only`` pass over the history, newest commit first. The result is
+    cached for the current HEAD commit. If `root` is a subfolder of the git
+    repository, only the history of files inside `root` is considered.
+    """
+    logger = logging.getLogger(__name__)
+    root = Path(root).resolve()
+    head = _git_head(root)
+    if head is None:
+        logger.debug("No git history in %s: no folder times", root)
+        return {}
+    if folders is not None:
+        folders = frozenset(folders)
+    return dict(_read_folder_times(root, head, folders))
+
+
+@lru_cache(maxsize=32)
+def _read_folder_times(root, head, folders):
+    """Read the folder times from the git history of `root` at `head`.
+
+    The result is cached, so it must not be modified.
+    """
+    logger = logging.getLogger(__name__)
+    times = {}
+    remaining = None if folders is None else set(folders)
+    commit_time = None
+    proc = subprocess.Popen(
+        [
+            'git',
+            '-c',
+            'core.quotePath=false',
+            'log',
+            '--format=%x00%ct',
+            '--name-only',
+            '--relative',
+        ],
+        cwd=root,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        universal_newlines=True,
+    )
+    try:
+        for line in proc.stdout:
+            line = line.rstrip('\n')
+            if line.startswith('\0'):
+                commit_time = int(line[1:])
+            elif '/' in line:
+                folder = line.split('/', 1)[0]
+                if folder not in times:
+                    times[folder] = commit_time
+                    if remaining is not None:
+                        remaining.discard(folder)
+                        if len(remaining) == 0:
+                            break  # remaining history is irrelevant
+    finally:
+        proc.stdout.close()
+        proc.kill()
+        proc.wait()
+    logger.debug("Got folder times for %d folders at %s", len(times), head)
+    return times
+
+
+def get_time_groups(names, folders, folder_times, now=None):
+    """Determine the folders in time-based groups.
+
+    Args:
+        names (iterable[str]): names of time-based groups, e.g.
+            "older-than:180d"
+        folders (iterable[str]): all folders
+        folder_times (dict): map of folder names to the unix time of their
+            last deployment, see :func:`get_folder_times`. Folders that are
+            not in `folder_times` are considered to be deployed at `now`.
+        now (None or float): The current unix time. If None, use the system
+            time.
+
+    Returns:
+        dict: map of group names to a set of folders.
+
+    Raises:
+        ValueError: if any of the `names` is not a valid time-based group
+            name.
+    """
+    if now is None:
+        now = time.time()
+    folders = list(folders)
+    groups = {}
+    for name in names:
+        match = _RX_TIME_GROUP.fullmatch(name)
+        if match is None:
+            raise ValueError("Invalid time-based group name %r" % name)
+        age = (
+            int(match.group('amount'))
+            * _SECONDS_PER_UNIT[match.group('unit').lower()]
+        )
+        if match.group('relation').lower() == 'older':
+            groups[name] = {
+                folder
+                for folder in folders
+                if now - folder_times.get(folder, now) > age
+            }
+        else:
+            groups[name] = {
+                folder
+                for folder in folders
+                if now - folder_times.get(folder, now) <= age
+            }
+    return groups
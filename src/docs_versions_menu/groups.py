@@ -1,9 +1,194 @@
 """Classification of folders into groups according to :pep:`440`."""
 
-from .parse_version import NonVersionFolderName, parse_version
+import re
+from bisect import bisect_left, insort
+from collections.abc import Mapping
+from functools import lru_cache
 
+from .parse_version import (
+    SortKeyTable,
+    classify_folders,
+    is_version,
+    parse_version,
+)
+from .version_index import VersionIndex
 
-def get_groups(folders, default_branches=None):
+# The names of the groups returned by `get_groups`, in order
+_GROUP_NAMES = (
+    'dev-releases',
+    'local-releases',
+    'pre-releases',
+    'post-releases',
+    'final-releases',
+    'public-releases',
+    'branches',
+    'releases',
+    'default-branch',
+    'latest-per-major',
+    'latest-per-minor',
+    'all',
+)
+
+# Groups of the latest public release in each release series: group name =>
+# number of leading components of the release segment that define a series
+_SERIES_GROUPS = {'latest-per-major': 1, 'latest-per-minor': 2}
+
+
+# Valid names for user-defined groups (see `_GROUP_NAME_CHARS` in
+# folder_spec.py)
+_RX_GROUP_NAME = re.compile(r'[A-Za-z0-9][A-Za-z0-9_-]*')
+
+# Global inline flags at the start of a regex, e.g. "(?i)"
+_RX_GLOBAL_FLAGS = re.compile(r'\(\?([aiLmsux]+)\)')
+
+_DIGITS = tuple('123456789')
+
+
+def _has_group_reference(pattern):
+    """Check whether `pattern` refers to one of its groups by number.
+
+    This is the case for a backreference like ``\\1``, or a conditional
+    pattern like ``(?(1)yes|no)``. Escapes in character classes are octal
+    escapes, not backreferences.
+    """
+    i = 0
+    in_class = False
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            if not in_class and pattern.startswith(_DIGITS, i + 1):
+                return True
+            i += 2
+            continue
+        if in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+            i += 1
+            if pattern.startswith('^', i):
+                i += 1
+            if pattern.startswith(']', i):
+                i += 1  # literal ']' at the start of the class
+            continue
+        elif pattern.startswith('(?(', i):
+            return True
+        i += 1
+    return False
+
+
+def _scope_global_flags(pattern):
+    """Convert global inline flags at the start of `pattern` to scoped flags.
+
+    For example, ``(?i)-lts$`` becomes ``(?i:-lts$)``. Global flags are only
+    allowed at the start of the combined regex of all custom groups, whereas
+    scoped flags only apply to the pattern itself.
+    """
+    flags = ''
+    pos = 0
+    while True:
+        match = _RX_GLOBAL_FLAGS.match(pattern, pos)
+        if match is None:
+            break
+        flags += match.group(1)
+        pos = match.end()
+    if flags == '':
+        return pattern
+    return '(?%s:%s)' % (flags, pattern[pos:])
+
+
+class _CustomGroupMatcher:
+    """Matcher for user-defined groups, given as a regular expression for each
+    group.
+
+    Args:
+        custom_groups (tuple): tuple of ``(name, pattern)`` pairs
+
+    All patterns are combined into a single regex that contains an optional
+    lookahead for each pattern, with a named capture group. Matching a folder
+    name against the combined regex once then determines all the groups that
+    the folder belongs to. Each pattern matches anywhere in the folder name
+    (like :func:`re.search`), unless it is anchored with ``^`` or ``$``.
+
+    Inline flags at the start of a pattern (e.g. ``(?i)``) only apply to that
+    pattern. Named groups and references to groups (e.g. ``\\1``) are not
+    supported, as the group numbers in the combined regex differ from those
+    in the individual patterns.
+    """
+
+    def __init__(self, custom_groups):
+        self.names = tuple(name for (name, _) in custom_groups)
+        alternatives = []
+        for i, (name, pattern) in enumerate(custom_groups):
+            if not _RX_GROUP_NAME.fullmatch(name):
+                raise ValueError("Invalid group name %r" % name)
+            if name.lower() in _GROUP_NAMES:
+                raise ValueError(
+                    "Invalid group name %r: conflicts with a built-in group"
+                    % name
+                )
+            try:
+                regex = re.compile(pattern)
+            except re.error as exc:
+                raise ValueError(
+                    "Invalid regex %r for group %r: %s" % (pattern, name, exc)
+                )
+            if len(regex.groupindex) > 0:
+                raise ValueError(
+                    "Invalid regex %r for group %r: named groups are not "
+                    "supported" % (pattern, name)
+                )
+            if _has_group_reference(pattern):
+                raise ValueError(
+                    "Invalid regex %r for group %r: references to groups are "
+                    "not supported" % (pattern, name)
+                )
+            alternatives.append(
+                r'(?=(?P<_g%d>.*?(?:%s)))?' % (i, _scope_global_flags(pattern))
+            )
+        if len(set(name.lower() for name in self.names)) < len(self.names):
+            raise ValueError("Duplicate group names in %r" % (self.names,))
+        try:
+            self._regex = re.compile(''.join(alternatives), re.DOTALL)
+        except re.error as exc:
+            raise ValueError(
+                "Invalid regexes for groups %r: %s" % (self.names, exc)
+            )
+        self._group_names = {
+            '_g%d' % i: name for (i, name) in enumerate(self.names)
+        }
+
+    def __call__(self, folder):
+        """Return the list of the names of all groups that `folder` is in."""
+        match = self._regex.match(folder)
+        return [
+            self._group_names[key]
+            for (key, value) in match.groupdict().items()
+            if value is not None and key in self._group_names
+        ]
+
+
+@lru_cache(maxsize=32)
+def _custom_group_matcher(custom_groups):
+    """Return a cached :class:`_CustomGroupMatcher` for `custom_groups`."""
+    return _CustomGroupMatcher(custom_groups)
+
+
+def _as_pairs(custom_groups):
+    """Normalize `custom_groups` to a tuple of ``(name, pattern)`` pairs."""
+    if custom_groups is None:
+        return ()
+    if isinstance(custom_groups, Mapping):
+        custom_groups = custom_groups.items()
+    return tuple((name, pattern) for (name, pattern) in custom_groups)
+
+
+def get_groups(
+    folders,
+    default_branches=None,
+    sort_keys=None,
+    custom_groups=None,
+    extra_groups=None,
+):
     """Sort the given folder names into groups.
 
     Args:
@@ -12,6 +197,22 @@ def get_groups(folders, default_branches=None):
         default_branches (list[str] or None): List of eligible branch names for
             the project's default branch. If None, equivalent to
             ``['master', 'main']``
+        sort_keys (SortKeyTable or None): If given, a table to which the sort
+            keys for all `folders` are added. This table may then be used as
+            the `sort_key` for resolving folder specifications for the
+            resulting groups.
+        custom_groups (dict or list or None): User-defined groups, as a map
+            (or a list of tuples) of group names to regular expressions
+            (strings). The
+            group contains all `folders` that match the regular expression
+            (anywhere in the folder name, unless the regex is anchored with
+            ``^`` or ``$``). A group name must consist of letters, numbers,
+            hyphens and underscores, and it must be different from any of the
+            built-in group names.
+        extra_groups (dict or None): Additional groups, as a map of group
+            names to a set of folders, e.g. the time-based groups from
+            :func:`.get_time_groups`. Folders that are not in `folders` are
+            ignored.
 
     Returns a dict `groups` with the following group names as keys: and a set
     of folder names for each group as values:
@@ -32,7 +233,18 @@ def get_groups(folders, default_branches=None):
     * 'branches': Any folder that PEP400 does not recognize as a release
       (including `default_branch`)
     * 'releases': Any folder that PEP400 recognizes as a release
+    * 'latest-per-major': The latest public release for each major version
+      (e.g., "v1.2.1" for the series "v1.0.0", "v1.1.0", "v1.2.0", "v1.2.1")
+    * 'latest-per-minor': The latest public release for each minor version
+      (e.g., "v1.1.0" and "v1.2.1" for the above series)
     * 'all': Set of all folders
+
+    In addition, `groups` contains a set of folders for each of the
+    `custom_groups` and `extra_groups`.
+
+    Raises:
+        ValueError: if `custom_groups` contains an invalid group name or an
+            invalid regular expression.
     """
     if default_branches is None:
         default_branches = ['master', 'main']
@@ -48,29 +260,323 @@ def get_groups(folders, default_branches=None):
         'default-branch': set(),
     }
     for folder in folders:
-        version = parse_version(folder)
         if folder in default_branches:
             groups['default-branch'].add(folder)
-        if isinstance(version, NonVersionFolderName):
-            groups['branches'].add(folder)
-        else:
-            groups['releases'].add(folder)
-            is_final = True
-            if version.local is not None:
-                groups['local-releases'].add(folder)
-                is_final = False
-            if version.is_devrelease:
-                groups['dev-releases'].add(folder)
-                is_final = False
-            if version.is_prerelease:
-                groups['pre-releases'].add(folder)
-                is_final = False
-            if version.is_postrelease:
-                groups['post-releases'].add(folder)
-                groups['public-releases'].add(folder)
-                is_final = False
-            if is_final:
-                groups['final-releases'].add(folder)
-                groups['public-releases'].add(folder)
+    releases, branches = classify_folders(folders)
+    groups['branches'].update(branches)
+    if sort_keys is not None:
+        for folder in branches:
+            sort_keys(folder)
+    for folder in releases:
+        version = parse_version(folder)
+        if sort_keys is not None:
+            sort_keys.add(folder, version)
+        for name in _release_group_names(version):
+            groups[name].add(folder)
+    groups.update(_latest_per_series(groups['public-releases'], sort_keys))
     groups['all'] = set(folders)
+    custom_groups = _as_pairs(custom_groups)
+    if len(custom_groups) > 0:
+        matcher = _custom_group_matcher(custom_groups)
+        for name in matcher.names:
+            groups[name] = set()
+        for folder in groups['all']:
+            for name in matcher(folder):
+                groups[name].add(folder)
+    if extra_groups is not None:
+        for name, group in extra_groups.items():
+            if name in groups:
+                raise ValueError("Duplicate group name %r" % name)
+            groups[name] = groups['all'].intersection(group)
     return groups
+
+
+def _series(version, n_components):
+    """Return the release series of `version`.
+
+    The series is defined by the epoch and the first `n_components` of the
+    release segment (padded with zeros).
+    """
+    release = version.release + (0,) * n_components
+    return (version.epoch, *release[:n_components])
+
+
+def _latest_per_series(releases, sort_keys=None):
+    """Return the groups of the latest release in each release series.
+
+    Returns:
+        dict: map of the names in `_SERIES_GROUPS` to the set of the latest
+        `releases` in each series.
+
+    The `releases` are sorted once, and then grouped by series in a single
+    pass, each later release replacing the previous latest release of its
+    series. Releases that sort as equal are ordered by name.
+    """
+    if sort_keys is None:
+        sort_keys = parse_version
+    latest = {name: {} for name in _SERIES_GROUPS}
+    for folder in sorted(releases, key=lambda f: (sort_keys(f), f)):
+        version = parse_version(folder)
+        for name, n_components in _SERIES_GROUPS.items():
+            latest[name][_series(version, n_components)] = folder
+    return {name: set(latest[name].values()) for name in _SERIES_GROUPS}
+
+
+def _release_group_names(version):
+    """Return the names of all the groups that a release `version` is in."""
+    names = ['releases']
+    is_final = True
+    if version.local is not None:
+        names.append('local-releases')
+        is_final = False
+    if version.is_devrelease:
+        names.append('dev-releases')
+        is_final = False
+    if version.is_prerelease:
+        names.append('pre-releases')
+        is_final = False
+    if version.is_postrelease:
+        names.append('post-releases')
+        names.append('public-releases')
+        is_final = False
+    if is_final:
+        names.append('final-releases')
+        names.append('public-releases')
+    return names
+
+
+class GroupTable(Mapping):
+    """Immutable map of group names to groups of folders, sorted by version.
+
+    Each group is a :class:`.VersionIndex`, that is, a tuple of folder names
+    sorted according to :pep:`440`, with :math:`O(1)` membership tests.
+    Instances should be obtained via :func:`get_group_table`.
+
+    Attributes:
+        sort_keys (SortKeyTable): The sort keys of all folders in the groups
+    """
+
+    __slots__ = ('_groups', 'sort_keys')
+
+    def __init__(self, groups, sort_keys):
+        self._groups = dict(groups)
+        self.sort_keys = sort_keys
+
+    def __getitem__(self, name):
+        return self._groups[name]
+
+    def __iter__(self):
+        return iter(self._groups)
+
+    def __len__(self):
+        return len(self._groups)
+
+    def __repr__(self):
+        return "GroupTable(%r)" % self._groups
+
+
+def get_group_table(
+    folders,
+    default_branches=None,
+    sort_keys=None,
+    custom_groups=None,
+    extra_groups=None,
+):
+    """Sort the given folder names into pre-sorted groups.
+
+    Args:
+        folders (list[str]): List of folder names
+        default_branches (list[str] or None): List of eligible branch names for
+            the project's default branch, see :func:`get_groups`
+        sort_keys (SortKeyTable or None): table to which the sort keys for all
+            `folders` are added. If None, a new table is created.
+        custom_groups (dict or list or None): User-defined groups, see
+            :func:`get_groups`
+        extra_groups (dict or None): Additional groups, see
+            :func:`get_groups`
+
+    Returns:
+        GroupTable: map of the group names described in :func:`get_groups` to
+        the folders in each group, sorted according to :pep:`440`.
+
+    All `folders` are sorted only once. Resolving folder specifications
+    against the resulting groups (with the default `sort_key`) never requires
+    sorting a group.
+    """
+    if sort_keys is None:
+        sort_keys = SortKeyTable()
+    groups = get_groups(
+        folders,
+        default_branches=default_branches,
+        sort_keys=sort_keys,
+        custom_groups=custom_groups,
+        extra_groups=extra_groups,
+    )
+    ordered = sorted(dict.fromkeys(folders), key=sort_keys)
+    table = {}
+    for name, group in groups.items():
+        members = [folder for folder in ordered if folder in group]
+        table[name] = VersionIndex.from_sorted(
+            members, (sort_keys(folder) for folder in members), sort_keys
+        )
+    return GroupTable(table, sort_keys)
+
+
+class GroupIndex:
+    """Classification of folders into sorted groups, with incremental updates.
+
+    Args:
+        folders (iterable[str]): The initial folder names
+        default_branches (list[str] or None): List of eligible branch names for
+            the project's default branch, see :func:`get_groups`
+        custom_groups (dict or list or None): User-defined groups, see
+            :func:`get_groups`
+
+    Folders can be added and removed with :meth:`add` and :meth:`remove`,
+    which update only the groups that the folder is in. Within each group,
+    folders are kept sorted according to :pep:`440` (and by name, for folders
+    that sort as equal), so that the position of a folder is found by
+    bisection. The current groups are available as the :attr:`groups`
+    mapping, which is equivalent to the result of :func:`get_group_table`.
+    """
+
+    def __init__(self, folders=(), default_branches=None, custom_groups=None):
+        if default_branches is None:
+            default_branches = ['master', 'main']
+        self.default_branches = frozenset(default_branches)
+        self.sort_keys = SortKeyTable()
+        custom_groups = _as_pairs(custom_groups)
+        self._matcher = None
+        group_names = _GROUP_NAMES
+        if len(custom_groups) > 0:
+            self._matcher = _custom_group_matcher(custom_groups)
+            group_names += self._matcher.names
+        # For each group, a sorted list of (sort key, folder) tuples
+        self._items = {name: [] for name in group_names}
+        # For each of the _SERIES_GROUPS, a map of release series to a sorted
+        # list of (sort key, folder) tuples of the public releases in that
+        # series
+        self._series = {name: {} for name in _SERIES_GROUPS}
+        self._indices = {}  # cached VersionIndex for each unmodified group
+        for folder in folders:
+            self.add(folder)
+
+    def __repr__(self):
+        return "GroupIndex(%r)" % (self.folders,)
+
+    def __len__(self):
+        return len(self._items['all'])
+
+    def __iter__(self):
+        return iter(self.folders)
+
+    def __contains__(self, folder):
+        return folder in self.sort_keys and self._find(folder) is not None
+
+    @property
+    def folders(self):
+        """Tuple of all folders, sorted according to :pep:`440`."""
+        return self.groups['all'].folders
+
+    @property
+    def groups(self):
+        """A :class:`GroupTable` of the current groups.
+
+        The table is a snapshot: it does not change when folders are later
+        added or removed.
+        """
+        indices = self._indices
+        for name, items in self._items.items():
+            if name not in indices:
+                indices[name] = VersionIndex.from_sorted(
+                    (folder for (_, folder) in items),
+                    (key for (key, _) in items),
+                    self.sort_keys,
+                )
+        return GroupTable(
+            {name: indices[name] for name in self._items}, self.sort_keys
+        )
+
+    def group_names(self, folder):
+        """Return the names of the groups that `folder` belongs to."""
+        names = ['all']
+        if folder in self.default_branches:
+            names.append('default-branch')
+        if is_version(folder):
+            names.extend(_release_group_names(parse_version(folder)))
+        else:
+            names.append('branches')
+        if self._matcher is not None:
+            names.extend(self._matcher(folder))
+        return names
+
+    def _find(self, folder):
+        """Return the position of `folder` in the 'all' group, or None."""
+        items = self._items['all']
+        item = (self.sort_keys(folder), folder)
+        pos = bisect_left(items, item)
+        if pos < len(items) and items[pos] == item:
+            return pos
+        return None
+
+    def add(self, folder):
+        """Add `folder` to all its groups.
+
+        Adding a folder that is already in the index has no effect.
+        """
+        if folder in self:
+            return
+        item = (self.sort_keys(folder), folder)
+        names = self.group_names(folder)
+        for name in names:
+            insort(self._items[name], item)
+            self._indices.pop(name, None)
+        if 'public-releases' in names:
+            version = parse_version(folder)
+            for name, n_components in _SERIES_GROUPS.items():
+                series = self._series[name].setdefault(
+                    _series(version, n_components), []
+                )
+                previous_latest = series[-1] if series else None
+                insort(series, item)
+                if series[-1] != previous_latest:
+                    self._replace(name, previous_latest, series[-1])
+
+    def remove(self, folder):
+        """Remove `folder` from all its groups.
+
+        Raises:
+            KeyError: if `folder` is not in the index.
+        """
+        if folder not in self:
+            raise KeyError(folder)
+        item = (self.sort_keys(folder), folder)
+        names = self.group_names(folder)
+        for name in names:
+            items = self._items[name]
+            del items[bisect_left(items, item)]
+            self._indices.pop(name, None)
+        if 'public-releases' in names:
+            version = parse_version(folder)
+            for name, n_components in _SERIES_GROUPS.items():
+                key = _series(version, n_components)
+                series = self._series[name][key]
+                latest = series[-1]
+                del series[bisect_left(series, item)]
+                if len(series) == 0:
+                    del self._series[name][key]
+                    self._replace(name, latest, None)
+                elif series[-1] != latest:
+                    self._replace(name, latest, series[-1])
+
+    def _replace(self, name, old_item, new_item):
+        """Replace `old_item` with `new_item` in the group `name`.
+
+        Either item may be None, for adding or removing a single item.
+        """
+        items = self._items[name]
+        if old_item is not None:
+            del items[bisect_left(items, old_item)]
+        if new_item is not None:
+            insort(items, new_item)
+        self._indices.pop(name, None)
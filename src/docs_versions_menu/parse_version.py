@@ -4,16 +4,38 @@ The ``parse_version`` function provided here is functionally equivalent to
 ``packaging.version.parse`` in ``packaging < 22.0``.
 """
 
+import re
+from functools import lru_cache
+
 import packaging.version
 
+# Maximum number of distinct folder names for which the result of
+# `parse_version` is kept in memory
+_PARSE_VERSION_CACHE_SIZE = 8192
+
+# Pre-check for PEP 440 versions, identical to the regex used in
+# packaging.version.Version. Folder names that do not match this regex (e.g.
+# branch names) are classified without instantiating (and failing to
+# instantiate) a packaging.version.Version, as raising and catching the
+# resulting InvalidVersion exception is comparatively slow.
+_RX_VERSION = re.compile(
+    r"\s*" + packaging.version.VERSION_PATTERN + r"\s*",
+    re.VERBOSE | re.IGNORECASE,
+)
+
 
 class NonVersionFolderName(packaging.version._BaseVersion):
-    """A "version" that is just an arbitrary folder name"""
+    """A "version" that is just an arbitrary folder name
+
+    Instances are immutable.
+    """
+
+    __slots__ = ('name', '_key')
 
     def __init__(self, name):
         name = str(name)
-        self.name = name
-        self._key = (-1, (f'*{name}', '*final'))
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, '_key', (-1, (f'*{name}', '*final')))
         # The _key mimics the _key of a LegacyVersion in packaging < 22.0.
         # The "-1" is a hard-coded "epoch" here. A PEP 440 version can only
         # have a epoch greater than or equal to 0. This will sort
@@ -21,6 +43,14 @@ class NonVersionFolderName(packaging.version._BaseVersion):
         #
         # Sorting behavior is inherited from _BaseVersion
 
+    def __setattr__(self, name, value):
+        raise AttributeError("NonVersionFolderName is immutable")
+
+    def __reduce__(self):
+        # support copy and pickle, which would restore the slots through
+        # __setattr__
+        return (type(self), (self.name,))
+
     def __str__(self):
         return self.name
 
@@ -29,16 +59,168 @@ class NonVersionFolderName(packaging.version._BaseVersion):
 
 
 class VersionFolderName(packaging.version.Version):
-    """A PEP440-compatible version name."""
+    """A PEP440-compatible version name.
+
+    Instances are immutable. The comparison key and the hash are computed on
+    instantiation.
+    """
+
+    __slots__ = ('_frozen',)
+
+    def __init__(self, version):
+        super().__init__(version)
+        hash(self)  # in recent versions of packaging, caches the `_key`, too
+        _ = self._key  # cache the comparison key before freezing
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError("VersionFolderName is immutable")
+        super().__setattr__(name, value)
+
+    def __reduce__(self):
+        # support copy and pickle, which would restore the slots through
+        # __setattr__
+        return (type(self), (str(self),))
 
     def __repr__(self):
         return f"<VersionFolderName('{self}')>"
 
 
+@lru_cache(maxsize=_PARSE_VERSION_CACHE_SIZE)
 def parse_version(name):
     """Parse `name` string into either a `VersionFolderName` or a
-    `NonVersionFolderName` object."""
+    `NonVersionFolderName` object.
+
+    The result is cached, so that parsing the same `name` repeatedly (e.g.
+    as a sort key) returns the same immutable object.
+    """
+    if _RX_VERSION.fullmatch(str(name)) is None:
+        return NonVersionFolderName(name)
     try:
         return VersionFolderName(name)
     except packaging.version.InvalidVersion:
         return NonVersionFolderName(name)
+
+
+def is_version(name):
+    """Check whether the folder `name` is a PEP440-compatible version.
+
+    This is equivalent to ``isinstance(parse_version(name),
+    VersionFolderName)``, but for names that are clearly not a version (e.g.
+    branch names) does not parse `name`.
+    """
+    if _RX_VERSION.fullmatch(name) is None:
+        return False
+    return isinstance(parse_version(name), VersionFolderName)
+
+
+def classify_folders(names):
+    """Sort folder `names` into versions and non-versions.
+
+    Returns:
+        tuple[list[str], list[str]]: The list of names that are
+        PEP440-compatible versions and the list of all other names, each in
+        the original order of `names`.
+    """
+    versions = []
+    non_versions = []
+    for name in names:
+        if is_version(name):
+            versions.append(name)
+        else:
+            non_versions.append(name)
+    return versions, non_versions
+
+
+# Rank of the pre-release segment in a flat sort key (see `_flat_key`)
+_PRE_RANK = {'a': 0, 'b': 1, 'rc': 2}
+_PRE_RANK_DEV_ONLY = -1
+_PRE_RANK_NONE = 3
+
+
+def _flat_key(version):
+    """Return a flat sort key for a parsed `version`.
+
+    The key is a tuple of only integers, strings, and tuples of integers and
+    strings. Comparing keys therefore happens entirely in C, but gives the
+    same result as comparing the `version` objects.
+    """
+    if isinstance(version, NonVersionFolderName):
+        return (-1, version.name)  # before all versions, as epoch >= 0
+    release = version.release
+    n = len(release)
+    while n > 1 and release[n - 1] == 0:
+        n -= 1  # 1.0.0 == 1
+    pre, post, dev = version.pre, version.post, version.dev
+    if pre is None and post is None and dev is not None:
+        pre_rank, pre_n = _PRE_RANK_DEV_ONLY, 0  # 1.0.dev1 < 1.0a1
+    elif pre is None:
+        pre_rank, pre_n = _PRE_RANK_NONE, 0
+    else:
+        pre_rank, pre_n = _PRE_RANK[pre[0]], pre[1]
+    local = ()
+    if version.local is not None:
+        local = tuple(
+            (int(part), '') if part.isdigit() else (-1, part)
+            for part in version.local.split('.')
+        )
+    return (
+        version.epoch,
+        release[:n],
+        pre_rank,
+        pre_n,
+        0 if post is None else 1,
+        0 if post is None else post,
+        1 if dev is None else 0,
+        0 if dev is None else dev,
+        local,
+    )
+
+
+class SortKeyTable:
+    """Table of flat sort keys for folder names.
+
+    Args:
+        folders (iterable[str]): folder names to add to the table initially
+
+    A :class:`SortKeyTable` is a callable that can be used as a `sort_key` in
+    place of :func:`parse_version`, and sorts folder names in the same order.
+    Instead of a version object, it maps every folder name to a plain tuple
+    (computed only once), so that sorting and comparisons do not have to go
+    through the Python-level comparison methods of the version objects:
+
+    >>> table = SortKeyTable(['v1.0.0', 'master'])
+    >>> sorted(['v1.0.0', 'master', 'v1.0.0-rc1'], key=table)
+    ['master', 'v1.0.0-rc1', 'v1.0.0']
+    >>> len(table)
+    3
+
+    The keys of folder names that are not in the table are added on demand.
+    """
+
+    __slots__ = ('_keys',)
+
+    def __init__(self, folders=()):
+        self._keys = {}
+        for folder in folders:
+            self(folder)
+
+    def __call__(self, folder):
+        """Return the sort key for `folder`."""
+        try:
+            return self._keys[folder]
+        except KeyError:
+            key = _flat_key(parse_version(folder))
+            self._keys[folder] = key
+            return key
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, folder):
+        return folder in self._keys
+
+    def add(self, folder, version):
+        """Add `folder` with the already parsed `version` to the table."""
+        self._keys[folder] = _flat_key(version)
@@ -1,13 +1,33 @@
 """Implementation of the versions-data collection."""
 
+import json
 import logging
+import os
 import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
 
 import jinja2
 
-from .folder_spec import resolve_folder_spec
-from .groups import get_groups
+from .folder_spec import BatchResolver, resolve_folder_spec
+from .folder_times import get_folder_times, get_time_groups, time_group_names
+from .groups import get_group_table
+
+# A line ``[label]: url`` in a downloads file
+_RX_DOWNLOADS_LINE = re.compile(r'^\[(?P<label>.*)\]:\s*(?P<url>.*)$')
+
+# A valid download url: /... or http://...
+_RX_DOWNLOADS_URL = re.compile(r'^(\w+:/)?/')
+
+# Name of the cache file for the parsed downloads files, in the root directory
+DOWNLOADS_CACHE_FILE = '.docs-versions-menu-cache'
+
+# Version of the format of the DOWNLOADS_CACHE_FILE
+_DOWNLOADS_CACHE_VERSION = 1
 
 
 def get_version_data(
@@ -19,25 +39,60 @@ def get_version_data(
     warnings,
     label_specs,
     downloads_file=None,
+    timings=None,
+    custom_groups=None,
+    root='.',
+    jobs=1,
+    downloads_cache=False,
+    previous_data=None,
 ):
-    """Get the versions data, to be serialized to json."""
+    """Get the versions data, to be serialized to json.
+
+    The versions data is collected for the folders in the `root` directory
+    (the root of the ``gh-pages`` branch), which defaults to the current
+    working directory.
+
+    The `custom_groups` are user-defined groups that may be referenced in the
+    folder specifications, see :func:`.get_groups`.
+
+    If `timings` is given as a list, a tuple ``(description, seconds)`` is
+    appended to it for each of the steps in collecting the versions data, in
+    particular for resolving each of the folder specifications.
+
+    If `jobs` is larger than 1, the `downloads_file` in all folders are read
+    concurrently by a pool of `jobs` threads. This can be much faster on a
+    network file system. The result does not depend on `jobs`.
+
+    If `downloads_cache` is True, the parsed `downloads_file` of all folders
+    are cached in the file :data:`DOWNLOADS_CACHE_FILE` in the `root`
+    directory. A downloads file is only read again if its modification time,
+    size, or inode has changed since it was cached.
+
+    If `previous_data` is given, the result includes a fingerprint of each
+    folder (the modification time of the folder and of its `downloads_file`)
+    in the key 'fingerprints'. The `previous_data` should be the result of an
+    earlier call (e.g., as read from ``versions.json``), or an empty dict.
+    The downloads of folders whose fingerprint is unchanged since the
+    `previous_data` are then taken from `previous_data` instead of
+    reading the `downloads_file` again.
+
+    Apart from appending to `timings`, none of the arguments are modified. In
+    particular, the default warnings ("outdated", "unreleased",
+    "prereleased") are added to a copy of `warnings`. If `root` is given
+    explicitly, the result does not depend on the current working directory,
+    so that the versions data for several projects can be collected
+    concurrently, e.g. in a thread pool.
+    """
     logger = logging.getLogger(__name__)
+    warnings = dict(warnings)  # local copy, to add the default warnings
 
-    folders = sorted(
-        [
-            str(f)
-            for f in Path().iterdir()
-            if (
-                f.is_dir()
-                and not str(f).startswith('.')
-                and not str(f).startswith('_')
-            )
-        ]
-    )
+    with _timer(timings, "find folders"):
+        folders = _find_folders(root)
 
-    default_branches = resolve_folder_spec(
-        default_branch_spec, {'all': folders}
-    )
+    with _timer(timings, "default-branch: %s" % default_branch_spec):
+        default_branches = resolve_folder_spec(
+            default_branch_spec, {'all': folders}
+        )
     try:
         default_branch = default_branches[0]
         logger.debug(
@@ -48,20 +103,35 @@ def get_version_data(
     except IndexError:
         default_branch = None
         logger.warning("No default branch")
-    groups = get_groups(folders, default_branches=default_branches)
+    specs = [versions_spec, latest_spec, *warnings.values()]
+    specs.extend(spec for (spec, _) in label_specs)
+    with _timer(timings, "time-based groups"):
+        time_groups = _get_time_groups(folders, specs, root)
+    with _timer(timings, "groups"):
+        groups = get_group_table(
+            folders,
+            default_branches=default_branches,
+            custom_groups=custom_groups,
+            extra_groups=time_groups,
+        )
+    # share sorted groups and sub-expressions between specs
+    resolver = BatchResolver(groups)
 
     labels = {}
+    jinja_env = jinja2.Environment()
     for spec, template_str in label_specs:
-        label_folders = resolve_folder_spec(spec, groups)
+        with _timer(timings, "label: %s" % spec):
+            label_folders = resolver.resolve(spec)
+        label_template = jinja_env.from_string(template_str)
         for folder in label_folders:
-            label_template = jinja2.Environment().from_string(template_str)
             labels[folder] = label_template.render(folder=folder)
     for folder in folders:
         if folder not in labels:
             labels[folder] = folder
 
     try:
-        latest = resolve_folder_spec(latest_spec, groups)[-1]
+        with _timer(timings, "latest: %s" % latest_spec):
+            latest = resolver.resolve(latest_spec)[-1]
         labels[latest] += suffix_latest
     except IndexError:
         latest = None
@@ -75,7 +145,8 @@ def get_version_data(
         warnings['unreleased'] = '<branches>, <local-releases>'
     if 'prereleased' not in warnings:
         warnings['prereleased'] = '<pre-releases>'
-    versions = resolve_folder_spec(versions_spec, groups)
+    with _timer(timings, "versions: %s" % versions_spec):
+        versions = resolver.resolve(versions_spec)
     versions = list(reversed(versions))  # newest first
     version_data = {
         # list of *all* folders
@@ -99,16 +170,42 @@ def get_version_data(
         # folder => list of (label, file)
         'downloads': {folder: [] for folder in folders},
     }
+    unchanged_downloads = {}
+    if previous_data is not None:
+        with _timer(timings, "fingerprints"):
+            fingerprints = _get_fingerprints(folders, downloads_file, root)
+        version_data['fingerprints'] = fingerprints
+        unchanged_downloads = _get_unchanged_downloads(
+            previous_data, fingerprints
+        )
+        logger.debug(
+            "Using previous downloads for %d unchanged folders",
+            len(unchanged_downloads),
+        )
     if downloads_file is None:
         logger.debug("Disable download links (downloads_file is None)")
     else:
-        version_data['downloads'] = {
-            folder: _find_downloads(folder, downloads_file)
-            for folder in folders
-        }
+        with _timer(timings, "downloads"):
+            downloads = _find_all_downloads(
+                [f for f in folders if f not in unchanged_downloads],
+                downloads_file,
+                root,
+                jobs,
+                cache_file=(
+                    Path(root) / DOWNLOADS_CACHE_FILE
+                    if downloads_cache
+                    else None
+                ),
+                keep_cached=unchanged_downloads.keys(),
+            )
+            downloads.update(unchanged_downloads)
+            version_data['downloads'] = {
+                folder: downloads[folder] for folder in folders
+            }
 
     for name, warning_spec in warnings.items():
-        warning_folders = resolve_folder_spec(warning_spec, groups)
+        with _timer(timings, "warning %s: %s" % (name, warning_spec)):
+            warning_folders = set(resolver.resolve(warning_spec))
         for folder in version_data['warnings'].keys():
             if folder in warning_folders:
                 version_data['warnings'][folder].append(name)
@@ -116,7 +213,288 @@ def get_version_data(
     return version_data
 
 
-def _find_downloads(folder, downloads_file):
+def _find_folders(root='.'):
+    """Return a sorted list of all folders in the `root` directory.
+
+    Hidden folders and folders starting with an underscore are excluded.
+
+    The folders are found with a single :func:`os.scandir` of `root`. The
+    file type of each entry is usually known from the directory listing, so
+    that no additional ``stat`` system call is needed (except for symbolic
+    links).
+    """
+    with os.scandir(root) as entries:
+        return sorted(
+            [
+                entry.name
+                for entry in entries
+                if (not entry.name.startswith(('.', '_')) and entry.is_dir())
+            ]
+        )
+
+
+def get_folder_groups(
+    default_branch_spec, custom_groups=None, specs=(), root='.'
+):
+    """Return the groups of folders in the `root` directory.
+
+    This is the `groups` dict that the folder specifications passed to
+    :func:`get_version_data` are resolved against. It includes the
+    time-based groups referenced in any of the `specs`.
+    """
+    folders = _find_folders(root)
+    default_branches = resolve_folder_spec(
+        default_branch_spec, {'all': folders}
+    )
+    return get_group_table(
+        folders,
+        default_branches=default_branches,
+        custom_groups=custom_groups,
+        extra_groups=_get_time_groups(folders, specs, root),
+    )
+
+
+def _get_time_groups(folders, specs, root='.'):
+    """Return the time-based groups referenced in `specs`, or None."""
+    names = time_group_names(specs)
+    if len(names) == 0:
+        return None
+    folder_times = get_folder_times(folders, root=root)
+    return get_time_groups(names, folders, folder_times)
+
+
+@contextmanager
+def _timer(timings, description):
+    """Append ``(description, seconds)`` for the block to `timings`.
+
+    If `timings` is None, do nothing.
+    """
+    if timings is None:
+        yield
+    else:
+        start = time.perf_counter()
+        yield
+        timings.append((description, time.perf_counter() - start))
+
+
+def _get_fingerprints(folders, downloads_file, root='.'):
+    """Return a dict of folder => fingerprint for all `folders`.
+
+    The fingerprint of a folder is a list ``[mtime_ns, downloads_file,
+    downloads_mtime_ns, downloads_size]`` of the modification time of the
+    folder, the name of the `downloads_file`, and the modification time and
+    size of the `downloads_file` in the folder (None, if the folder does not
+    contain a `downloads_file`). Folders that no longer exist have no
+    fingerprint.
+    """
+    fingerprints = {}
+    for folder in folders:
+        path = Path(root) / folder
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        downloads_mtime_ns = downloads_size = None
+        if downloads_file is not None:
+            try:
+                stat = os.stat(path / downloads_file)
+                downloads_mtime_ns = stat.st_mtime_ns
+                downloads_size = stat.st_size
+            except OSError:
+                pass
+        fingerprints[folder] = [
+            mtime_ns,
+            downloads_file,
+            downloads_mtime_ns,
+            downloads_size,
+        ]
+    return fingerprints
+
+
+def _get_unchanged_downloads(previous_data, fingerprints):
+    """Return the downloads from `previous_data` for unchanged folders.
+
+    Returns:
+        dict: map of folder => downloads, for every folder whose fingerprint
+        in `fingerprints` matches the fingerprint in `previous_data`, and that
+        has a download file.
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        previous_fingerprints = previous_data.get('fingerprints', {})
+        previous_downloads = previous_data.get('downloads', {})
+        return {
+            folder: [tuple(link) for link in previous_downloads[folder]]
+            for (folder, fingerprint) in fingerprints.items()
+            if (
+                fingerprint[2] is not None
+                and previous_fingerprints.get(folder) == fingerprint
+                and folder in previous_downloads
+            )
+        }
+    except (AttributeError, TypeError, ValueError) as exc:
+        logger.warning("Ignoring invalid previous versions data: %s", exc)
+        return {}
+
+
+def _find_all_downloads(
+    folders, downloads_file, root='.', jobs=1, cache_file=None, keep_cached=()
+):
+    """Return a dict of folder => :func:`_find_downloads` for all `folders`.
+
+    If `jobs` is larger than 1, the downloads files are read concurrently by a
+    pool of `jobs` threads. The keys of the resulting dict are in the same
+    order as `folders` in any case.
+
+    If `cache_file` is given, use and update the cache of parsed downloads
+    files in that file, see :func:`_find_cached_downloads`. Only the entries
+    for `folders` and for the folders in `keep_cached` are kept in the
+    updated cache.
+    """
+    if cache_file is None:
+        find = partial(
+            _find_downloads, downloads_file=downloads_file, root=root
+        )
+    else:
+        cache = _read_downloads_cache(cache_file)
+        find = partial(
+            _find_cached_downloads,
+            downloads_file=downloads_file,
+            root=root,
+            cache=cache,
+        )
+    if jobs > 1 and len(folders) > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(find, folders))
+    else:
+        results = [find(folder) for folder in folders]
+    if cache_file is None:
+        return dict(zip(folders, results))
+    downloads = {}
+    keep_cached = set(keep_cached)
+    entries = {
+        key: entry
+        for (key, entry) in cache.items()
+        if key.split('/', 1)[0] in keep_cached
+    }
+    for folder, (folder_downloads, key, entry) in zip(folders, results):
+        downloads[folder] = folder_downloads
+        if entry is not None:
+            entries[key] = entry
+    if entries != cache:
+        _write_downloads_cache(cache_file, entries)
+    return downloads
+
+
+def _find_cached_downloads(folder, downloads_file, root, cache):
+    """Find artifact links in downloads_file file, using `cache`.
+
+    The `cache` maps the path of a downloads file (relative to `root`) to a
+    list ``[mtime_ns, size, inode, downloads]``, where ``downloads`` is the
+    result of :func:`_find_downloads` if the downloads file has the given
+    modification time, size, and inode. If this is the case, the downloads
+    file is not read.
+
+    Returns:
+        tuple: ``(downloads, key, entry)``, where ``key`` and ``entry`` are
+        the key and (new or unchanged) value for `cache`. If there is no
+        downloads file, ``entry`` is None.
+    """
+    key = '%s/%s' % (folder, downloads_file)
+    path = Path(root) / folder / downloads_file
+    try:
+        stat = os.stat(path)
+    except OSError:
+        logger = logging.getLogger(__name__)
+        logger.warning("folder '%s' contains no %s", folder, path)
+        return [], key, None
+    fingerprint = [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+    entry = cache.get(key)
+    if entry is not None and entry[:3] == fingerprint:
+        return [tuple(link) for link in entry[3]], key, entry
+    downloads = _find_downloads(folder, downloads_file, root)
+    return downloads, key, fingerprint + [[list(d) for d in downloads]]
+
+
+def _read_downloads_cache(cache_file):
+    """Return the cached downloads from `cache_file`.
+
+    Return an empty dict if `cache_file` does not exist or is invalid.
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        with open(cache_file) as in_fh:
+            data = json.load(in_fh)
+        if data['version'] == _DOWNLOADS_CACHE_VERSION:
+            logger.debug("Using downloads cache %s", cache_file)
+            entries = dict(data['downloads'])
+            downloads = {
+                key: entry
+                for (key, entry) in entries.items()
+                if _is_valid_cache_entry(entry)
+            }
+            if len(downloads) < len(entries):
+                logger.warning(
+                    "Ignoring %d invalid entries in cache %s",
+                    len(entries) - len(downloads),
+                    cache_file,
+                )
+            return downloads
+        logger.debug("Ignoring outdated downloads cache %s", cache_file)
+    except FileNotFoundError:
+        logger.debug("No downloads cache %s", cache_file)
+    except (OSError, ValueError, TypeError, KeyError) as exc:
+        logger.warning("Ignoring invalid cache %s: %s", cache_file, exc)
+    return {}
+
+
+def _is_valid_cache_entry(entry):
+    """Check that `entry` is a list ``[mtime_ns, size, inode, downloads]``.
+
+    The `downloads` must be a list of ``[label, url]`` lists, see
+    :func:`_find_cached_downloads`.
+    """
+    return (
+        isinstance(entry, list)
+        and len(entry) == 4
+        and all(isinstance(value, int) for value in entry[:3])
+        and isinstance(entry[3], list)
+        and all(
+            isinstance(link, list)
+            and len(link) == 2
+            and all(isinstance(value, str) for value in link)
+            for link in entry[3]
+        )
+    )
+
+
+def _write_downloads_cache(cache_file, downloads):
+    """Write the cached `downloads` to `cache_file`.
+
+    The file is replaced atomically, so that concurrent runs never see a
+    partially written cache.
+    """
+    logger = logging.getLogger(__name__)
+    cache_file = Path(cache_file)
+    data = {'version': _DOWNLOADS_CACHE_VERSION, 'downloads': downloads}
+    try:
+        fd, tmp_file = tempfile.mkstemp(
+            dir=cache_file.parent, prefix=cache_file.name + '.'
+        )
+        try:
+            with os.fdopen(fd, 'w') as out_fh:
+                json.dump(data, out_fh)
+            os.replace(tmp_file, cache_file)
+        except BaseException:
+            os.unlink(tmp_file)
+            raise
+    except OSError as exc:
+        logger.warning("Cannot write cache %s: %s", cache_file, exc)
+    else:
+        logger.debug("Wrote downloads cache %s", cache_file)
+
+
+def _find_downloads(folder, downloads_file, root='.'):
     """Find artifact links in downloads_file file.
 
     The `downloads_file` should be created during the build procedure (on
@@ -125,17 +503,17 @@ def _find_downloads(folder, downloads_file):
     Each line in the `downloads_file` should have the form ``[label]: url``.
     For backwards compatibility, having only the url is also acceptable. In
     this case, the label is derived from the file extension.
+
+    The `folder` is relative to the `root` directory.
     """
     logger = logging.getLogger(__name__)
     downloads = []
-    rx_line = re.compile(r'^\[(?P<label>.*)\]:\s*(?P<url>.*)$')
-    rx_url = re.compile(r'^(\w+:/)?/')  # /... or http://...
     try:
-        downloads_file = Path(folder) / downloads_file
+        downloads_file = Path(root) / folder / downloads_file
         with downloads_file.open() as in_fh:
             logger.debug("Processing downloads_file %s", downloads_file)
             for line in in_fh:
-                match = rx_line.match(line)
+                match = _RX_DOWNLOADS_LINE.match(line)
                 if match:
                     url = match.group('url')
                     label = match.group('label')
@@ -147,7 +525,7 @@ def _find_downloads(folder, downloads_file):
                     )
                     url = line.strip()
                     label = url.split(".")[-1].lower()
-                if not rx_url.match(url):
+                if not _RX_DOWNLOADS_URL.match(url):
                     logger.error("INVALID URL: %s", url)
                     logger.warning(
                         "Skipping invalid URL %r (must be absolute path or "
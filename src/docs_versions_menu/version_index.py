@@ -0,0 +1,121 @@
+"""Sorted index of folder names with range queries according to :pep:`440`."""
+
+from bisect import bisect_left, bisect_right
+
+from .parse_version import parse_version
+
+
+class VersionIndex:
+    """Immutable sequence of folder names, sorted according to :pep:`440`.
+
+    Args:
+        folders (iterable[str]): folder names
+        sort_key (None or callable): map of folder name to sortable object. If
+            None, sorting will be done according to :pep:`440`. Range queries
+            are only meaningful if `sort_key` is :func:`.parse_version`, a
+            :class:`.SortKeyTable`, or None.
+
+    The index supports the (read-only) sequence protocol, :math:`O(1)`
+    membership tests, and :math:`O(\\log n)` range queries via
+    :meth:`index_range` and :meth:`range`:
+
+    >>> index = VersionIndex(['v1.0.0', 'master', 'v0.1.0', 'v2.0.0-rc1'])
+    >>> index.folders
+    ('master', 'v0.1.0', 'v1.0.0', 'v2.0.0-rc1')
+    >>> index.range(lower='v0.1.0', lower_inclusive=False, upper='v2.0.0')
+    ('v1.0.0', 'v2.0.0-rc1')
+    """
+
+    __slots__ = ('folders', 'keys', 'sort_key', '_members')
+
+    def __init__(self, folders, sort_key=None):
+        if sort_key is None:
+            sort_key = parse_version
+        decorated = sorted(
+            ((sort_key(folder), folder) for folder in dict.fromkeys(folders)),
+            key=lambda item: item[0],
+        )
+        self.folders = tuple(folder for (_, folder) in decorated)
+        self.keys = tuple(key for (key, _) in decorated)
+        self.sort_key = sort_key
+        self._members = frozenset(self.folders)
+
+    @classmethod
+    def from_sorted(cls, folders, keys, sort_key):
+        """Create an index from already sorted `folders`, without sorting.
+
+        Args:
+            folders (iterable[str]): unique folder names, sorted by `keys`
+            keys (iterable): the result of `sort_key` for each folder
+            sort_key (callable): the sort key that `folders` are sorted by
+        """
+        index = cls.__new__(cls)
+        index.folders = tuple(folders)
+        index.keys = tuple(keys)
+        index.sort_key = sort_key
+        index._members = frozenset(index.folders)
+        return index
+
+    def __repr__(self):
+        return "VersionIndex(%r)" % (self.folders,)
+
+    def __len__(self):
+        return len(self.folders)
+
+    def __iter__(self):
+        return iter(self.folders)
+
+    def __getitem__(self, item):
+        return self.folders[item]
+
+    def __contains__(self, folder):
+        return folder in self._members
+
+    def index_range(
+        self,
+        lower=None,
+        upper=None,
+        *,
+        lower_inclusive=True,
+        upper_inclusive=True,
+    ):
+        """Return a tuple ``(start, stop)`` of indices for a range query.
+
+        Args:
+            lower (None or str or version): The lower bound. A string is
+                converted with the `sort_key`. Otherwise, `lower` must be
+                comparable to the result of the `sort_key`. If None, the range
+                is not bounded from below.
+            upper (None or str or version): The upper bound
+            lower_inclusive (bool): Whether folders equal to `lower` are
+                included in the range.
+            upper_inclusive (bool): Whether folders equal to `upper` are
+                included in the range.
+
+        The folders in the range are ``index.folders[start:stop]``. If the
+        range is empty, `start` may be larger than `stop`.
+        """
+        start, stop = 0, len(self.keys)
+        if lower is not None:
+            if isinstance(lower, str):
+                lower = self.sort_key(lower)
+            if lower_inclusive:
+                start = bisect_left(self.keys, lower)
+            else:
+                start = bisect_right(self.keys, lower)
+        if upper is not None:
+            if isinstance(upper, str):
+                upper = self.sort_key(upper)
+            if upper_inclusive:
+                stop = bisect_right(self.keys, upper)
+            else:
+                stop = bisect_left(self.keys, upper)
+        return start, stop
+
+    def range(self, lower=None, upper=None, **kwargs):
+        """Return a tuple of all folders between `lower` and `upper`.
+
+        See :meth:`index_range` for the arguments.
+        """
+        start, stop = self.index_range(lower, upper, **kwargs)
+        return self.folders[start:stop]
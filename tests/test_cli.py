@@ -16,6 +16,7 @@ from packaging.version import Version as parse_version
 
 import docs_versions_menu
 from docs_versions_menu.cli import main as docs_versions_menu_command
+from docs_versions_menu.version_data import DOWNLOADS_CACHE_FILE
 
 
 def test_version():
@@ -681,3 +682,165 @@ def test_custom_labels_warnings(caplog):
         with (cwd / 'versions.json').open() as versions_json:
             versions_data = json.load(versions_json)
             assert versions_data == expected_versions_data
+
+
+def test_explain():
+    """Test ``docs-versions-menu --explain SPEC``."""
+    root = Path(__file__).with_suffix('') / 'gh_pages_default'
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        cwd = Path.cwd()
+        copy_tree(str(root), str(cwd))
+        result = runner.invoke(
+            docs_versions_menu_command,
+            [
+                '--explain',
+                '(<releases> < v1.0)[-1], <branches>',
+                '--downloads-cache',
+            ],
+        )
+        assert result.exit_code == 0
+        lines = result.output.splitlines()
+        assert lines[0].startswith('(<releases> < v1.0)[-1], <branches>  [2 ')
+        assert lines[0].endswith(']: v0.1.0, main')
+        assert lines[1].startswith('  (<releases> < v1.0)[-1]  [1 folder, ')
+        assert lines[3].startswith('    < v1.0  [1 folder, ')
+        assert "Run time of collecting the versions data" in result.output
+        assert "versions: (<branches> != <default-branch>)" in result.output
+        assert "warning outdated: (<releases> < v1.0.0)" in result.output
+        assert not (cwd / 'versions.json').is_file()
+        assert not (cwd / 'index.html').is_file()
+        assert not (cwd / DOWNLOADS_CACHE_FILE).is_file()
+        result = runner.invoke(
+            docs_versions_menu_command, ['--explain', '<unknown>']
+        )
+        assert result.exit_code == 1
+        assert "Invalid specification" in result.output
+        env = {'DOCS_VERSIONS_MENU_EXPLAIN': '<all>'}
+        result = runner.invoke(docs_versions_menu_command, env=env)
+        assert result.exit_code == 0
+        assert (cwd / 'versions.json').is_file()
+        versions_py = (cwd / 'versions.py').read_text()
+        assert 'DOCS_VERSIONS_MENU_EXPLAIN' not in versions_py
+
+
+def test_custom_groups(caplog):
+    """Test defining custom groups with ``--group NAME REGEX``."""
+    root = Path(__file__).with_suffix('') / 'gh_pages_default'
+    runner = CliRunner()
+    caplog.set_level(logging.DEBUG)
+    with runner.isolated_filesystem():
+        cwd = Path.cwd()
+        subprocess.run(['git', 'init'], check=True)
+        copy_tree(str(root), str(cwd))
+        for folder in ['pr-1', 'pr-2', 'v1.0.0-lts']:
+            (cwd / folder).mkdir()
+        result = runner.invoke(
+            docs_versions_menu_command,
+            [
+                '--group',
+                'previews',
+                r'^pr-\d+$',
+                '--group',
+                'lts',
+                r'-lts$',
+                '--versions',
+                '(<all> not in <previews>)',
+                '--warning',
+                'lts',
+                '<lts>',
+                '--no-write-versions-py',
+            ],
+        )
+        assert result.exit_code == 0
+        with (cwd / 'versions.json').open() as versions_json:
+            versions_data = json.load(versions_json)
+        assert versions_data['versions'] == [
+            'v1.0.0',
+            'v0.1.0',
+            'v1.0.0-lts',
+            'main',
+        ]
+        assert versions_data['warnings']['v1.0.0-lts'] == [
+            'lts',
+            'unreleased',
+        ]
+
+
+def test_root(caplog):
+    """Test running docs-versions-menu outside of the gh-pages root."""
+    root = Path(__file__).with_suffix('') / 'gh_pages_default'
+    runner = CliRunner()
+    caplog.set_level(logging.DEBUG)
+    with runner.isolated_filesystem():
+        cwd = Path.cwd()
+        gh_pages = cwd / 'gh-pages'
+        gh_pages.mkdir()
+        subprocess.run(['git', 'init'], cwd=gh_pages, check=True)
+        copy_tree(str(root), str(gh_pages))
+        result = runner.invoke(
+            docs_versions_menu_command, ['--root', 'gh-pages']
+        )
+        assert result.exit_code == 0
+        for file in [
+            'index.html',
+            '.nojekyll',
+            'versions.json',
+            'versions.py',
+        ]:
+            assert (gh_pages / file).is_file()
+            assert not (cwd / file).exists()
+        proc = subprocess.run(
+            ['git', 'ls-files'],
+            cwd=gh_pages,
+            check=True,
+            universal_newlines=True,
+            stdout=subprocess.PIPE,
+        )
+        assert 'versions.json' in proc.stdout.split("\n")
+        with (gh_pages / 'versions.json').open() as versions_json:
+            versions_data = json.load(versions_json)
+        assert versions_data['folders'] == ['main', 'v0.1.0', 'v1.0.0']
+        assert versions_data['downloads']['main'] == [
+            ['pdf', '/main/main.pdf'],
+            ['zip', '/main/main.zip'],
+            ['epub', '/main/main.epub'],
+        ]
+        env = {
+            'DOCS_VERSIONS_MENU_ROOT': 'gh-pages',
+            'DOCS_VERSIONS_MENU_SUFFIX_LATEST': ' [latest]',
+        }
+        result = runner.invoke(docs_versions_menu_command, env=env)
+        assert result.exit_code == 0
+        versions_py = (gh_pages / 'versions.py').read_text()
+        assert "'DOCS_VERSIONS_MENU_SUFFIX_LATEST': ' [latest]'" in versions_py
+        assert 'DOCS_VERSIONS_MENU_ROOT' not in versions_py
+
+
+def test_incremental(caplog):
+    """Test running docs-versions-menu with ``--incremental``."""
+    root = Path(__file__).with_suffix('') / 'gh_pages_default'
+    runner = CliRunner()
+    caplog.set_level(logging.DEBUG)
+    with runner.isolated_filesystem():
+        cwd = Path.cwd()
+        subprocess.run(['git', 'init'], check=True)
+        copy_tree(str(root), str(cwd))
+        result = runner.invoke(docs_versions_menu_command, ['--incremental'])
+        assert result.exit_code == 0
+        assert "No previous versions data in versions.json" in caplog.text
+        with (cwd / 'versions.json').open() as versions_json:
+            versions_data = json.load(versions_json)
+        assert set(versions_data['fingerprints']) == {
+            'main',
+            'v0.1.0',
+            'v1.0.0',
+        }
+        caplog.clear()
+        result = runner.invoke(docs_versions_menu_command, ['--incremental'])
+        assert result.exit_code == 0
+        assert (
+            "Using previous downloads for 3 unchanged folders" in caplog.text
+        )
+        with (cwd / 'versions.json').open() as versions_json:
+            assert json.load(versions_json) == versions_data
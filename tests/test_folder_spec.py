@@ -1,8 +1,20 @@
 """Test folder list specifications."""
 
+import copy
+import pickle
+
 import pytest
 
-from docs_versions_menu.folder_spec import resolve_folder_spec
+from docs_versions_menu.folder_spec import (
+    BatchResolver,
+    CompiledFolderSpec,
+    _group_name_matcher,
+    compile_folder_spec,
+    explain_folder_spec,
+    resolve_folder_spec,
+    resolve_folder_specs,
+)
+from docs_versions_menu.parse_version import parse_version
 
 
 @pytest.fixture
@@ -166,6 +178,30 @@ def test_item_conditional_spec():
     two_cond = resolve_folder_spec("(<releases> > v0.1.0 < v2.0.0)", releases)
     assert two_cond == ['v0.2.0', 'v1.0.0', 'v1.1.0']
 
+    below_all = resolve_folder_spec(
+        "(<releases> < (v1.1.0, v1.0.0))", releases
+    )
+    assert below_all == ['v0.1.0', 'v0.2.0']
+
+    above_all = resolve_folder_spec(
+        "(<releases> >= (v1.0.0, v1.1.0))", releases
+    )
+    assert above_all == ['v1.1.0', 'v2.0.0']
+
+    equal = resolve_folder_spec("(<releases> == 1.0)", releases)
+    assert equal == ['v1.0.0']
+
+    equal_all = resolve_folder_spec(
+        "(<releases> == (v1.0.0, v1.1.0))", releases
+    )
+    assert equal_all == []
+
+    in_list = resolve_folder_spec("(<releases> in (v1.0.0, v2.0.0))", releases)
+    assert in_list == ['v1.0.0', 'v2.0.0']
+
+    empty_operand = resolve_folder_spec("(<releases> < (nothing))", releases)
+    assert empty_operand == releases['releases']
+
 
 def test_set_conditional_spec(groups):
     """Test conditional specifications w.r.t. set membership."""
@@ -228,3 +264,202 @@ def test_grouped_sorting(groups):
         '((v1.0.0, v0.2.0, v1.1.1))[::-1]', groups
     )
     assert res_sort_reverse == ['v1.1.1', 'v1.0.0', 'v0.2.0']
+
+
+def test_parse_cache(groups):
+    """Test that specifications are parsed only once."""
+    group_names = tuple(groups.keys())
+    spec = '(<releases> < (<stable-releases>)[-1])[-2:]'
+    compiled1 = compile_folder_spec(spec, group_names)
+    compiled2 = compile_folder_spec(spec, groups.keys())
+    assert compiled1 is compiled2
+    assert _group_name_matcher(group_names) is _group_name_matcher(
+        tuple(groups.keys())
+    )
+    res1 = resolve_folder_spec(spec, groups)
+    res2 = resolve_folder_spec(spec, groups)
+    assert res1 == res2 == ['v1.1.0', 'v1.1.0-post1']
+
+
+def test_compile_folder_spec(groups):
+    """Test evaluating a compiled specification against different groups."""
+    spec = compile_folder_spec('(<releases> < (<public-releases>)[-1])')
+    assert isinstance(spec, CompiledFolderSpec)
+    assert spec == compile_folder_spec(
+        '(<releases>  <  (<public-releases>)[-1])'
+    )
+    with pytest.raises(AttributeError):
+        spec.spec = '<all>'
+    groups1 = {
+        'releases': ['v0.1.0', 'v1.0.0-rc1', 'v1.0.0'],
+        'public-releases': ['v0.1.0', 'v1.0.0'],
+        'all': ['master', 'v0.1.0', 'v1.0.0-rc1', 'v1.0.0'],
+    }
+    groups2 = {
+        'releases': ['v2.0.0', 'v1.0.0'],
+        'public-releases': ['v1.0.0'],
+        'all': ['v1.0.0', 'v2.0.0'],
+    }
+    assert spec.evaluate(groups1) == ['v0.1.0', 'v1.0.0-rc1']
+    assert spec.evaluate(groups2) == []
+    assert spec.evaluate(groups1) == ['v0.1.0', 'v1.0.0-rc1']
+    with pytest.raises(ValueError) as exc_info:
+        spec.evaluate({'releases': [], 'all': []})
+    assert "unknown group <public-releases>" in str(exc_info.value)
+    for clone in [
+        copy.copy(spec),
+        copy.deepcopy(spec),
+        pickle.loads(pickle.dumps(spec)),
+    ]:
+        assert clone == spec
+        assert hash(clone) == hash(spec)
+        assert clone.spec == spec.spec
+        assert clone.evaluate(groups1) == ['v0.1.0', 'v1.0.0-rc1']
+    spec = compile_folder_spec('<RELEASES>')
+    assert spec.evaluate(groups2) == ['v1.0.0', 'v2.0.0']
+
+
+def test_bitset_engine(groups):
+    """Test that the 'bitset' engine gives the same results as 'list'."""
+    specs = [
+        '<branches>, <releases>',
+        '(<extra-branches>, <main-branches>), (<releases>)[::-1]',
+        '(<releases>)[1::2], <main-branches>',
+        '(<releases>)[-1], (<releases>)[-2]',
+        '<extra-branches>,(<main-branches>)[0],<releases>,<main-branches>',
+        '(<releases> > v0.1.0 < v1.1.0 not in <pre-releases>)',
+        '(<releases> in (<releases>)[:-1] )[::-2]',
+        '(<releases> == v1.0.0), (<releases> != v1.0.0)',
+        '(<releases> < (<stable-releases>)[-1])[-2:]',
+        '((v1.0.0, v0.2.0, v1.1.1))[::-1], (v1.0.0, v0.2.0, master)[:]',
+        'master, nobranch, <extra-branches>',
+        '',
+    ]
+    for spec in specs:
+        expected = resolve_folder_spec(spec, groups)
+        assert resolve_folder_spec(spec, groups, engine='bitset') == expected
+    with pytest.raises(ValueError) as exc_info:
+        resolve_folder_spec('<releases>', groups, engine='unknown')
+    assert "Unknown engine 'unknown'" in str(exc_info.value)
+
+
+@pytest.mark.parametrize('engine', ['list', 'bitset'])
+def test_batch_resolution(groups, engine):
+    """Test that shared sub-expressions are resolved only once."""
+    specs = [
+        '(<stable-releases>)[-1]',
+        '(<releases> < (<stable-releases>)[-1])',
+        '(<releases> >= (<stable-releases>)[-1])',
+        '(<releases> < (<stable-releases>)[-1])',
+        '<branches>, (<releases> < (<stable-releases>)[-1])[-2:]',
+    ]
+    expected = [resolve_folder_spec(spec, groups) for spec in specs]
+    assert resolve_folder_specs(specs, groups, engine=engine) == expected
+
+    batch = BatchResolver(groups, engine=engine)
+    resolver = batch._resolver
+    n_calls = {}
+    _resolve_list = resolver._resolve_list
+
+    def counting_resolve_list(node):
+        n_calls[node] = n_calls.get(node, 0) + 1
+        return _resolve_list(node)
+
+    resolver._resolve_list = counting_resolve_list
+    assert batch.resolve_all(specs) == expected
+    assert len(n_calls) == 4
+    assert all(count == 1 for count in n_calls.values())
+    # results must be independent copies of the cached values
+    result = batch.resolve(specs[1])
+    result.append('master')
+    assert batch.resolve(specs[1]) == expected[1]
+
+
+def test_top_k_selection(groups):
+    """Test that small slices of a group do not require sorting the group."""
+    specs_and_results = [
+        ('(<releases>)[-1]', ['v1.1.1']),
+        ('(<releases>)[-2]', ['v1.1.0-post1']),
+        ('(<releases>)[-3:-1]', ['v1.1.0', 'v1.1.0-post1']),
+        ('(<releases>)[1]', ['v0.1.0-rc2']),
+        ('(<releases>)[:3]', ['v0.1.0-rc1', 'v0.1.0-rc2', 'v0.1.0']),
+        ('(<releases>)[1:2]', ['v0.1.0-rc2']),
+        ('(<releases> < v1.0.0 not in <pre-releases>)[-1]', ['v0.3.0']),
+        ('(<releases>)[-5:-10]', []),
+    ]
+    for spec, expected in specs_and_results:
+        batch = BatchResolver(groups)
+        assert batch.resolve(spec) == expected
+        assert 'releases' not in batch._resolver._indices
+    batch = BatchResolver(groups)
+    assert (
+        batch.resolve('(<releases>)[-50:]')
+        == sorted(groups['releases'], key=parse_version)[-50:]
+    )
+    assert 'releases' in batch._resolver._indices
+
+
+def test_spec_limits(groups):
+    """Test the limits on the length and nesting depth of a spec."""
+    spec = '(' * 50 + '<stable-releases>' + ')' * 50
+    assert resolve_folder_spec(spec, groups) == ['v1.0.0', 'v1.1.0', 'v1.1.1']
+    spec = '(' * 51 + '<stable-releases>' + ')' * 51
+    with pytest.raises(ValueError) as exc_info:
+        resolve_folder_spec(spec, groups)
+    assert "nesting deeper than 50 levels" in str(exc_info.value)
+    compiled = compile_folder_spec(spec, max_depth=60)
+    assert compiled.evaluate(groups) == ['v1.0.0', 'v1.1.0', 'v1.1.1']
+    spec = ", ".join(['master'] * 2000)
+    with pytest.raises(ValueError) as exc_info:
+        compile_folder_spec(spec)
+    assert "longer than 10000 characters" in str(exc_info.value)
+    compiled = compile_folder_spec(spec, max_length=len(spec))
+    assert compiled.evaluate(groups) == ['master']
+    spec = ", ".join('(<all> >= v1.0.0)' for _ in range(1000))
+    compiled = compile_folder_spec(spec, max_length=len(spec))
+    assert len(compiled.items) == 1000
+    assert compiled.evaluate(groups) == resolve_folder_spec(
+        '(<all> >= v1.0.0)', groups
+    )
+
+
+def test_explain_folder_spec(groups):
+    """Test the explanation of how a spec is evaluated."""
+    spec = '(<stable-releases> > v1.0.0 not in (<stable-releases>)[-1]), test'
+    lines = explain_folder_spec(spec, groups).splitlines()
+    assert len(lines) == 8
+    prefixes = [
+        spec + '  [2 folders, ',
+        '  (<stable-releases> > v1.0.0 not in (<stable-releases>)[-1])  '
+        '[1 folder, ',
+        '    <stable-releases>  [3 folders, ',
+        '    > v1.0.0  [2 folders, ',
+        '    not in (<stable-releases>)[-1]  [2 folders, ',
+        '      (<stable-releases>)[-1]  [1 folder, ',
+        '        <stable-releases>  [3 folders, ',
+        '  test  [1 folder, ',
+    ]
+    for line, prefix in zip(lines, prefixes):
+        assert line.startswith(prefix)
+    assert lines[0].endswith(' ms]: v1.1.0, test')
+    assert lines[4].endswith(' ms]: v1.0.0, v1.1.0')
+    lines = explain_folder_spec('<all>', groups, max_folders=2).splitlines()
+    assert len(lines) == 1
+    assert lines[0].endswith(' ms]: develop, ..., v1.1.1')
+    spec = '(<all>)[-1], (<all>)[0:2], (<all>)[::-1]'
+    lines = explain_folder_spec(spec, groups).splitlines()
+    assert lines[1].startswith('  (<all>)[-1]  ')
+    assert lines[3].startswith('  (<all>)[0:2]  ')
+    assert lines[5].startswith('  (<all>)[::-1]  ')
+    spec = '(<stable-releases> < (<stable-releases>)[-1])'
+    lines = explain_folder_spec(spec, groups).splitlines()
+    assert len(lines) == 5
+    prefixes = [
+        spec + '  [2 folders, ',
+        '  <stable-releases>  [3 folders, ',
+        '  < (<stable-releases>)[-1]  [2 folders, ',
+        '    (<stable-releases>)[-1]  [1 folder, ',
+        '      <stable-releases>  [3 folders, ',
+    ]
+    for line, prefix in zip(lines, prefixes):
+        assert line.startswith(prefix)
@@ -0,0 +1,107 @@
+"""Test time-based groups."""
+
+import os
+import subprocess
+
+from docs_versions_menu.folder_spec import resolve_folder_spec
+from docs_versions_menu.folder_times import (
+    _read_folder_times,
+    get_folder_times,
+    get_time_groups,
+    time_group_names,
+)
+from docs_versions_menu.version_data import get_folder_groups
+
+DAY = 86400
+
+
+def commit(root, folder, timestamp):
+    """Add a file to `folder` in the git repo `root` and commit it."""
+    (root / folder).mkdir(exist_ok=True)
+    (root / folder / 'index.html').write_text(str(timestamp))
+    env = dict(os.environ)
+    env.update(
+        {
+            'GIT_AUTHOR_NAME': 'Test',
+            'GIT_AUTHOR_EMAIL': 'test@example.com',
+            'GIT_COMMITTER_NAME': 'Test',
+            'GIT_COMMITTER_EMAIL': 'test@example.com',
+            'GIT_AUTHOR_DATE': '@%d +0000' % timestamp,
+            'GIT_COMMITTER_DATE': '@%d +0000' % timestamp,
+        }
+    )
+    subprocess.run(['git', 'add', folder], cwd=root, check=True)
+    subprocess.run(
+        ['git', 'commit', '-q', '-m', folder], cwd=root, env=env, check=True
+    )
+
+
+def test_time_group_names():
+    """Test finding time-based groups in specs."""
+    specs = [
+        '(<releases> in <older-than:180d>)',
+        '<newer-than:30D>, < older-than:180d >, <older-than>',
+    ]
+    assert time_group_names(specs) == ['older-than:180d', 'newer-than:30d']
+
+
+def test_get_time_groups(tmp_path):
+    """Test determining time-based groups from the git history."""
+    now = 1000 * DAY
+    subprocess.run(['git', 'init', '-q'], cwd=tmp_path, check=True)
+    commit(tmp_path, 'v0.1.0', now - 400 * DAY)
+    commit(tmp_path, 'master', now - 300 * DAY)
+    commit(tmp_path, 'v1.0.0', now - 100 * DAY)
+    commit(tmp_path, 'master', now - 10 * DAY)
+    (tmp_path / 'new-branch').mkdir()  # not committed
+    folder_times = get_folder_times(root=tmp_path)
+    assert folder_times == {
+        'v0.1.0': now - 400 * DAY,
+        'master': now - 10 * DAY,
+        'v1.0.0': now - 100 * DAY,
+    }
+    assert _read_folder_times.cache_info().currsize > 0
+    assert get_folder_times(['master'], root=tmp_path) == {
+        'master': now - 10 * DAY
+    }
+    folders = ['master', 'new-branch', 'v0.1.0', 'v1.0.0']
+    groups = get_time_groups(
+        ['older-than:180d', 'newer-than:30d', 'older-than:2w'],
+        folders,
+        folder_times,
+        now=now,
+    )
+    assert groups == {
+        'older-than:180d': {'v0.1.0'},
+        'newer-than:30d': {'master', 'new-branch'},
+        'older-than:2w': {'v0.1.0', 'v1.0.0'},
+    }
+
+
+def test_time_groups_in_specs(tmp_path, monkeypatch):
+    """Test using time-based groups in folder specifications."""
+    subprocess.run(['git', 'init', '-q'], cwd=tmp_path, check=True)
+    commit(tmp_path, 'v0.1.0', 0)
+    commit(tmp_path, 'v1.0.0', 2000000000)
+    monkeypatch.chdir(tmp_path)
+    groups = get_folder_groups('master', specs=['<older-than:1d>'])
+    assert groups['older-than:1d'].folders == ('v0.1.0',)
+    spec = '(<releases> not in <OLDER-THAN:1d>)'
+    assert resolve_folder_spec(spec, groups) == ['v1.0.0']
+
+
+def test_folder_times_nested_root(tmp_path):
+    """Test folder times for a root that is a subfolder of the repository."""
+    subprocess.run(['git', 'init', '-q'], cwd=tmp_path, check=True)
+    (tmp_path / 'site').mkdir()
+    commit(tmp_path, 'site/v1.0.0', 100)
+    commit(tmp_path, 'site/master', 200)
+    commit(tmp_path, 'v1.0.0', 300)  # outside of root
+    assert get_folder_times(root=tmp_path / 'site') == {
+        'v1.0.0': 100,
+        'master': 200,
+    }
+    assert get_folder_times(root=tmp_path) == {
+        'site': 200,
+        'v1.0.0': 300,
+    }
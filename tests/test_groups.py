@@ -1,6 +1,16 @@
 """Test classification of folders into groups."""
 
-from docs_versions_menu.groups import get_groups
+import pytest
+
+from docs_versions_menu.folder_spec import BatchResolver, resolve_folder_spec
+from docs_versions_menu.groups import (
+    GroupIndex,
+    GroupTable,
+    get_group_table,
+    get_groups,
+)
+from docs_versions_menu.parse_version import SortKeyTable, parse_version
+from docs_versions_menu.version_index import VersionIndex
 
 
 def test_get_groups():
@@ -46,3 +56,161 @@ def test_get_groups():
         'v1.0.0+dev',
     }
     assert groups['all'] == set(folders)
+
+
+def test_get_groups_sort_keys():
+    """Test that get_groups fills a table of sort keys."""
+    folders = ['master', 'v1.0.0', 'v1.0.0-rc1', 'v0.1.0', 'doc-testing']
+    sort_keys = SortKeyTable()
+    groups = get_groups(folders, sort_keys=sort_keys)
+    assert len(sort_keys) == len(folders)
+    assert all(folder in sort_keys for folder in folders)
+    assert sorted(groups['all'], key=sort_keys) == sorted(
+        folders, key=parse_version
+    )
+
+
+def test_get_group_table():
+    """Test the classification into pre-sorted groups."""
+    folders = ['v1.0.0', 'master', 'v1.0.0-rc1', 'v0.1.0', 'doc-testing']
+    groups = get_groups(folders)
+    table = get_group_table(folders)
+    assert isinstance(table, GroupTable)
+    assert list(table.keys()) == list(groups.keys())
+    for name, group in groups.items():
+        assert isinstance(table[name], VersionIndex)
+        assert table[name].folders == tuple(sorted(group, key=parse_version))
+    assert table['releases'].folders == ('v0.1.0', 'v1.0.0-rc1', 'v1.0.0')
+    assert 'master' in table['branches']
+    assert len(table.sort_keys) == len(folders)
+    resolver = BatchResolver(table)
+    assert resolver.resolve('(<releases>)[-1], <branches>') == [
+        'v1.0.0',
+        'doc-testing',
+        'master',
+    ]
+    assert resolver._resolver._indices['releases'] is table['releases']
+
+
+def test_group_index():
+    """Test incremental updates of a GroupIndex."""
+    folders = ['master', 'v0.1.0', 'v1.0.0', 'v1.0.0-rc1']
+    index = GroupIndex(folders)
+    assert len(index) == 4
+    assert index.folders == ('master', 'v0.1.0', 'v1.0.0-rc1', 'v1.0.0')
+    groups = index.groups
+    assert groups['releases'].folders == ('v0.1.0', 'v1.0.0-rc1', 'v1.0.0')
+    index.add('v0.2.0')
+    index.add('v0.2.0')  # no effect
+    index.add('doc-testing')
+    index.remove('v1.0.0-rc1')
+    assert 'v1.0.0-rc1' not in index
+    assert 'v0.2.0' in index
+    with pytest.raises(KeyError):
+        index.remove('v1.0.0-rc1')
+    # earlier snapshots are not affected
+    assert groups['releases'].folders == ('v0.1.0', 'v1.0.0-rc1', 'v1.0.0')
+    folders = ['doc-testing', 'master', 'v0.1.0', 'v0.2.0', 'v1.0.0']
+    table = get_group_table(folders)
+    assert list(index.groups.keys()) == list(table.keys())
+    for name in table:
+        assert index.groups[name].folders == table[name].folders
+    assert resolve_folder_spec(
+        '(<releases>)[-2:], <pre-releases>, <default-branch>', index.groups
+    ) == ['v0.2.0', 'v1.0.0', 'master']
+
+
+def test_custom_groups():
+    """Test user-defined groups based on regular expressions."""
+    folders = ['master', 'v1.0-lts', 'v1.0', 'v2.0-lts', 'pr-1', 'pr-x', 'lts']
+    custom_groups = {
+        'lts': r'^v\d+\.\d+-lts$',
+        'previews': r'^pr-\d+$',
+        'any_lts': 'lts',
+    }
+    groups = get_groups(folders, custom_groups=custom_groups)
+    assert list(groups.keys())[-3:] == ['lts', 'previews', 'any_lts']
+    assert groups['lts'] == {'v1.0-lts', 'v2.0-lts'}
+    assert groups['previews'] == {'pr-1'}
+    assert groups['any_lts'] == {'lts', 'v1.0-lts', 'v2.0-lts'}
+    assert groups['releases'] == {'v1.0'}
+    assert resolve_folder_spec('(<ALL> not in <previews>)', groups) == [
+        'lts',
+        'master',
+        'pr-x',
+        'v1.0-lts',
+        'v2.0-lts',
+        'v1.0',
+    ]
+    table = get_group_table(folders, custom_groups=list(custom_groups.items()))
+    assert table['lts'].folders == ('v1.0-lts', 'v2.0-lts')
+    index = GroupIndex(folders, custom_groups=custom_groups)
+    index.add('pr-2')
+    index.remove('pr-1')
+    assert index.groups['previews'].folders == ('pr-2',)
+    groups = get_groups(
+        folders, custom_groups={'lts': '(?i)-LTS$', 'v1': r'^(v)1\.[\1]'}
+    )
+    assert groups['lts'] == {'v1.0-lts', 'v2.0-lts'}
+    assert groups['v1'] == set()
+    for custom_groups, msg in [
+        ({'all': 'x'}, "conflicts with a built-in group"),
+        ({'pr previews': 'x'}, "Invalid group name"),
+        ({'previews': '^pr-(\\d+$'}, "Invalid regex"),
+        ([('lts', 'a'), ('LTS', 'b')], "Duplicate group names"),
+        ({'lts': '(?P<v>v1)', 'v2': '(?P<v>v2)'}, "named groups"),
+        ({'previews': r'^(pr)-\1$'}, "references to groups"),
+        ({'previews': r'^(pr-)?(?(1)\d+|x)$'}, "references to groups"),
+    ]:
+        with pytest.raises(ValueError) as exc_info:
+            get_groups(folders, custom_groups=custom_groups)
+        assert msg in str(exc_info.value)
+
+
+def test_latest_per_series():
+    """Test the groups of the latest release in each release series."""
+    folders = [
+        'master',
+        'v0.1.0',
+        'v0.2.0',
+        'v0.2.1',
+        'v0.2.2-rc1',
+        'v1.0',
+        'v1.0.0.post1',
+        'v1.1.0',
+        'v1.1.0+dev',
+        'v2.0.0-dev0',
+        '1!0.1',
+    ]
+    groups = get_groups(folders)
+    assert groups['latest-per-major'] == {'v0.2.1', 'v1.1.0', '1!0.1'}
+    assert groups['latest-per-minor'] == {
+        'v0.1.0',
+        'v0.2.1',
+        'v1.0.0.post1',
+        'v1.1.0',
+        '1!0.1',
+    }
+    assert resolve_folder_spec('(<latest-per-minor> < 1.0)', groups) == [
+        'v0.1.0',
+        'v0.2.1',
+    ]
+    table = get_group_table(folders)
+    for name in ['latest-per-major', 'latest-per-minor']:
+        assert set(table[name]) == groups[name]
+    index = GroupIndex(folders)
+    index.add('v1.2.0')
+    index.add('v1.0.1')
+    index.remove('v0.2.1')
+    index.remove('1!0.1')
+    assert index.groups['latest-per-major'].folders == ('v0.2.0', 'v1.2.0')
+    assert index.groups['latest-per-minor'].folders == (
+        'v0.1.0',
+        'v0.2.0',
+        'v1.0.1',
+        'v1.1.0',
+        'v1.2.0',
+    )
+    expected = get_group_table(index.folders)
+    for name in ['latest-per-major', 'latest-per-minor']:
+        assert index.groups[name].folders == expected[name].folders
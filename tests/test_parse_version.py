@@ -1,6 +1,18 @@
 """Test the parse_version function"""
 
-from docs_versions_menu.parse_version import parse_version
+import copy
+import pickle
+
+import pytest
+
+from docs_versions_menu.parse_version import (
+    NonVersionFolderName,
+    SortKeyTable,
+    VersionFolderName,
+    classify_folders,
+    is_version,
+    parse_version,
+)
 
 
 def test_parse_version():
@@ -74,3 +86,83 @@ def test_non_version_folder_name():
     assert v1 != v2
     assert v1 != v3
     assert v3 != v1
+
+
+def test_parse_version_cache():
+    """Test that parsed versions are cached and immutable."""
+    for name in ['v1.0.0-rc1', 'master']:
+        version = parse_version(name)
+        assert parse_version(name) is version
+        with pytest.raises(AttributeError):
+            version.name = 'other'
+        with pytest.raises(AttributeError):
+            version._key = (0,)
+        assert hash(version) == hash(parse_version(name))
+    assert parse_version('v1.0.0-rc1') == parse_version('1.0.0rc1')
+    assert parse_version('v1.0.0-rc1') is not parse_version('1.0.0rc1')
+
+
+def test_copy_parsed_version():
+    """Test copying and pickling the (immutable) parsed versions."""
+    for name in ['v1.0.0-rc1', 'master']:
+        version = parse_version(name)
+        for clone in [
+            copy.copy(version),
+            copy.deepcopy(version),
+            pickle.loads(pickle.dumps(version)),
+        ]:
+            assert type(clone) is type(version)
+            assert clone == version
+            assert str(clone) == str(version)
+            assert hash(clone) == hash(version)
+            with pytest.raises(AttributeError):
+                clone._key = (0,)
+
+
+def test_classify_folders():
+    """Test sorting folder names into versions and non-versions."""
+    names = ['master', 'v1.0.0', 'feature-xyz', '1.0rc1', 'v1.0.0-', '2020']
+    versions, non_versions = classify_folders(names)
+    assert versions == ['v1.0.0', '1.0rc1', '2020']
+    assert non_versions == ['master', 'feature-xyz', 'v1.0.0-']
+    for name in names:
+        version = parse_version(name)
+        assert is_version(name) == isinstance(version, VersionFolderName)
+        assert (name in non_versions) == isinstance(
+            version, NonVersionFolderName
+        )
+
+
+def test_sort_key_table():
+    """Test that a SortKeyTable sorts like :func:`parse_version`."""
+    names = [
+        'master',
+        'fix-bug',
+        '1!0.1',
+        '1.0',
+        '1.0.0',
+        '1.0.0.dev1',
+        '1.0.0a1.dev1',
+        '1.0.0a1',
+        '1.0.0b2',
+        '1.0.0rc1',
+        '1.0.0rc1.post1.dev2',
+        '1.0.0rc1.post1',
+        '1.0.0.post1.dev0',
+        '1.0.0.post1',
+        '1.0.0+abc',
+        '1.0.0+abc.1',
+        '1.0.0+1',
+        '1.0.0+ubuntu.2',
+        'v1.0.1',
+    ]
+    table = SortKeyTable(names[:5])
+    assert len(table) == 5
+    assert sorted(names, key=table) == sorted(names, key=parse_version)
+    assert len(table) == len(names)
+    for name1 in names:
+        for name2 in names:
+            v1, v2 = parse_version(name1), parse_version(name2)
+            k1, k2 = table(name1), table(name2)
+            assert (v1 < v2) == (k1 < k2)
+            assert (v1 == v2) == (k1 == k2)
@@ -0,0 +1,238 @@
+"""Differential test of the folder specification parser against pyparsing.
+
+Earlier versions of docs-versions-menu parsed folder specifications with a
+pyparsing grammar. The dependency-free parser in
+:mod:`docs_versions_menu.folder_spec` must produce the same tokens and report
+syntax errors at the same position. The pyparsing grammar is kept here as the
+reference implementation.
+"""
+
+import random
+
+import pytest
+
+from docs_versions_menu.folder_spec import (
+    _Condition,
+    _parse_folder_spec,
+    _to_slice,
+)
+
+pyparsing = pytest.importorskip('pyparsing')
+
+
+GROUP_NAMES = (
+    'local-releases',
+    'dev-releases',
+    'pre-releases',
+    'post-releases',
+    'final-releases',
+    'public-releases',
+    'releases',
+    'default-branch',
+    'branches',
+    'all',
+)
+
+
+def _as_tuple(tokens):
+    """Recursively convert a nested list of tokens into nested tuples."""
+    if isinstance(tokens, list):
+        return tuple(_as_tuple(token) for token in tokens)
+    return tokens
+
+
+def reference_grammar(group_names):
+    """The pyparsing grammar for folder specifications (reference)."""
+    from pyparsing import (
+        DelimitedList,
+        Forward,
+        Group,
+        Literal,
+        Optional,
+        Word,
+        ZeroOrMore,
+        alphanums,
+        nums,
+        one_of,
+    )
+
+    def convert_to_slice(parse_string, loc, tokens):
+        return _to_slice("".join(tokens[1:-1]))
+
+    def convert_to_condition(parse_string, loc, tokens):
+        op, arg = tokens[0], tokens[1]
+        if not isinstance(arg, str):
+            arg = _as_tuple(arg.as_list())
+        return _Condition(op, arg)
+
+    Int = Word(nums + "-", nums)
+    Colon = Literal(':')
+
+    SliceSpec = (
+        "["
+        + Optional(Int)
+        + Optional(Colon + Optional(Int))
+        + Optional(Colon + Optional(Int))
+        + "]"
+    ).set_parse_action(convert_to_slice)
+
+    LogicalOperator = (
+        Literal('in')
+        | Literal('not in')
+        | Literal('<=')
+        | Literal('<')
+        | Literal('==')
+        | Literal('!=')
+        | Literal('>=')
+        | Literal('>')
+    )
+
+    if group_names is None:
+        GroupName = Group("<" + Word(alphanums, alphanums + "-_:") + ">")
+    else:
+        GroupName = Group("<" + one_of(list(group_names), caseless=True) + ">")
+    FolderName = Word(alphanums, alphanums + ".-_+")
+
+    ParenthesizedListSpec = Forward()
+    ConditionSpec = Forward()
+
+    ParenthesizedListSpec <<= Group(
+        "("
+        + DelimitedList(GroupName | FolderName | ParenthesizedListSpec)
+        + ZeroOrMore(ConditionSpec)
+        + ")"
+        + Optional(SliceSpec)
+    )
+
+    ConditionSpec <<= LogicalOperator + (
+        FolderName | GroupName | ParenthesizedListSpec
+    )
+    ConditionSpec = ConditionSpec.set_parse_action(convert_to_condition)
+
+    ListSpec = DelimitedList(GroupName | FolderName | ParenthesizedListSpec)
+
+    return ListSpec | ParenthesizedListSpec
+
+
+def reference_parse(spec, grammar):
+    """Parse `spec` with the pyparsing `grammar`."""
+    if spec.strip() == '':
+        return ()
+    try:
+        return _as_tuple(grammar.parse_string(spec, parse_all=True).as_list())
+    except pyparsing.ParseException as exc:
+        raise ValueError(
+            "Invalid specification (marked '*'): %r" % exc.mark_input_line('*')
+        )
+
+
+class SpecGenerator:
+    """Random generator of (mostly) valid folder specifications."""
+
+    folder_names = ['master', 'v1.0.0', 'v0.1.0-rc1', '1.0', 'v2.0+dev', 'x']
+    operators = ['in', 'not in', '<=', '<', '==', '!=', '>=', '>']
+    slices = ['[-1]', '[0]', '[1:]', '[:-1]', '[::-1]', '[ 1 : 5 : 2 ]', '[:]']
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+
+    def ws(self):
+        return self.rng.choice(['', '', '', ' ', '  '])
+
+    def group(self):
+        name = self.rng.choice(GROUP_NAMES)
+        if self.rng.random() < 0.1:
+            name = name.upper()
+        return '<' + self.ws() + name + self.ws() + '>'
+
+    def item(self, depth):
+        r = self.rng.random()
+        if r < 0.4 or depth > 3:
+            return self.group()
+        elif r < 0.7:
+            return self.rng.choice(self.folder_names)
+        return self.parenthesized(depth + 1)
+
+    def list_spec(self, depth):
+        n_items = self.rng.randint(1, 3)
+        sep = self.ws() + ',' + self.ws()
+        return sep.join(self.item(depth) for _ in range(n_items))
+
+    def parenthesized(self, depth):
+        spec = '(' + self.ws() + self.list_spec(depth)
+        for _ in range(self.rng.choice([0, 0, 1, 2])):
+            op = self.rng.choice(self.operators)
+            spec += ' ' + op + ' ' + self.item(depth)
+        spec += self.ws() + ')'
+        if self.rng.random() < 0.3:
+            spec += self.ws() + self.rng.choice(self.slices)
+        return spec
+
+    def spec(self):
+        return self.ws() + self.list_spec(0) + self.ws()
+
+    def mutated_spec(self):
+        """Return a spec with random insertions, deletions, or replacements."""
+        spec = list(self.spec())
+        for _ in range(self.rng.randint(1, 3)):
+            pos = self.rng.randint(0, len(spec))
+            char = self.rng.choice('<>()[],:-! =abnot1')
+            r = self.rng.random()
+            if r < 0.4 or pos == len(spec):
+                spec.insert(pos, char)
+            elif r < 0.7:
+                del spec[pos]
+            else:
+                spec[pos] = char
+        return "".join(spec)
+
+
+def assert_same_result(spec, group_names, grammar):
+    try:
+        expected = reference_parse(spec, grammar)
+    except ValueError as exc:
+        with pytest.raises(ValueError) as exc_info:
+            _parse_folder_spec(spec, group_names)
+        if str(exc).startswith("Invalid specification"):
+            assert str(exc_info.value) == str(exc), spec
+        # else: the pyparsing reference raised an "invalid literal for int()"
+        # from within a parse action
+    else:
+        assert _parse_folder_spec(spec, group_names) == expected, spec
+
+
+@pytest.mark.parametrize('group_names', [GROUP_NAMES, None])
+def test_differential_parser(group_names):
+    """Test the parser against the pyparsing grammar on a generated corpus."""
+    grammar = reference_grammar(group_names)
+    generator = SpecGenerator(seed=42)
+    for _ in range(1000):
+        assert_same_result(generator.spec(), group_names, grammar)
+    for _ in range(2000):
+        assert_same_result(generator.mutated_spec(), group_names, grammar)
+
+
+@pytest.mark.parametrize(
+    'spec',
+    [
+        '<branches> <releases>',
+        '<invalid>, <releases>',
+        '(<branches>, <releases>[1:])',
+        'master, (<releases>)[a]',
+        'master, (<releases>)[1:2:3:4]',
+        '[master, <releases>]',
+        'master, <invalid>',
+        '(<releases> infoo)',
+        '(<releases> not  in <branches>)',
+        '(<releases>)[-]',
+        '(<releases>)[]',
+        '(<releases>',
+        '<releases>,',
+        '<pre-releasesX>',
+        'master,\n  (<releases>\n >> v1.0)',
+        '\tmaster,\t<releases>\t)',
+    ],
+)
+def test_parser_edge_cases(spec):
+    """Test the parser against the pyparsing grammar for edge cases."""
+    assert_same_result(spec, GROUP_NAMES, reference_grammar(GROUP_NAMES))
@@ -0,0 +1,215 @@
+"""Tests for the collection of versions data."""
+
+import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from docs_versions_menu import version_data
+from docs_versions_menu.version_data import (
+    DOWNLOADS_CACHE_FILE,
+    get_version_data,
+)
+
+
+def make_gh_pages(root, folders):
+    """Create `folders` in the directory `root`."""
+    root.mkdir()
+    for folder in folders:
+        (root / folder).mkdir()
+    (root / '.git').mkdir()
+    (root / '_static').mkdir()
+    (root / 'index.html').write_text('')
+    return root
+
+
+def version_data_kwargs(root, warnings):
+    return dict(
+        suffix_latest=' (latest)',
+        default_branch_spec='master, main',
+        versions_spec='(<branches> != <default-branch>), <releases>, master',
+        latest_spec='(<public-releases>)[-1]',
+        warnings=warnings,
+        label_specs=[('<releases>', 'v{{ folder[1:] }}')],
+        root=root,
+    )
+
+
+def test_get_version_data_root(tmp_path, monkeypatch):
+    """Test collecting the versions data outside of the current directory."""
+    root = make_gh_pages(
+        tmp_path / 'gh-pages', ['master', 'v1.0.0', 'v1.1.0-rc1', 'v0.1.0']
+    )
+    monkeypatch.chdir(tmp_path)  # does not contain any version folders
+    warnings = OrderedDict([('custom', '<branches>')])
+    data = get_version_data(**version_data_kwargs(root, warnings))
+    assert warnings == OrderedDict([('custom', '<branches>')])
+    assert data['folders'] == ['master', 'v0.1.0', 'v1.0.0', 'v1.1.0-rc1']
+    assert data['versions'] == ['master', 'v1.1.0-rc1', 'v1.0.0', 'v0.1.0']
+    assert data['latest'] == 'v1.0.0'
+    assert data['labels']['v1.0.0'] == 'v1.0.0 (latest)'
+    assert data['warnings'] == {
+        'master': ['custom', 'unreleased'],
+        'v0.1.0': ['outdated'],
+        'v1.0.0': [],
+        'v1.1.0-rc1': ['prereleased'],
+    }
+
+
+def test_get_version_data_threads(tmp_path):
+    """Test collecting the versions data for several roots concurrently."""
+    roots = [
+        make_gh_pages(
+            tmp_path / ('project%d' % i),
+            ['master'] + ['v%d.%d.0' % (i, minor) for minor in range(i + 1)],
+        )
+        for i in range(8)
+    ]
+    warnings = OrderedDict()
+    expected = [
+        get_version_data(**version_data_kwargs(root, warnings))
+        for root in roots
+    ]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(
+            pool.map(
+                lambda root: get_version_data(
+                    **version_data_kwargs(root, warnings)
+                ),
+                roots * 4,
+            )
+        )
+    assert results == expected * 4
+    assert len(warnings) == 0
+    assert expected[3]['latest'] == 'v3.3.0'
+
+
+def test_get_version_data_jobs(tmp_path):
+    """Test reading the downloads files with a thread pool."""
+    folders = ['master'] + ['v1.%d.0' % minor for minor in range(20)]
+    root = make_gh_pages(tmp_path / 'gh-pages', folders)
+    for i, folder in enumerate(folders):
+        if i % 3 != 0:  # some folders have no downloads file
+            (root / folder / '_downloads').write_text(
+                "[pdf]: /%s/doc.pdf\n[zip]: /%s/doc.zip\n" % (folder, folder)
+            )
+    kwargs = version_data_kwargs(root, {})
+    kwargs['downloads_file'] = '_downloads'
+    expected = get_version_data(**kwargs)
+    assert expected['downloads']['v1.0.0'] == [
+        ('pdf', '/v1.0.0/doc.pdf'),
+        ('zip', '/v1.0.0/doc.zip'),
+    ]
+    assert expected['downloads']['v1.2.0'] == []
+    data = get_version_data(jobs=4, **kwargs)
+    assert data == expected
+    assert list(data['downloads'].keys()) == sorted(folders)
+
+
+def test_downloads_cache(tmp_path, monkeypatch):
+    """Test caching the parsed downloads files."""
+    folders = ['master', 'v1.0.0', 'v2.0.0']
+    root = make_gh_pages(tmp_path / 'gh-pages', folders)
+    for folder in folders[1:]:
+        (root / folder / '_downloads').write_text(
+            "[pdf]: /%s/doc.pdf\n" % folder
+        )
+    kwargs = version_data_kwargs(root, {})
+    kwargs['downloads_file'] = '_downloads'
+    expected = get_version_data(**kwargs)
+    cache_file = root / DOWNLOADS_CACHE_FILE
+    assert not cache_file.exists()
+    assert get_version_data(downloads_cache=True, **kwargs) == expected
+    assert cache_file.is_file()
+    assert get_version_data(**kwargs)['folders'] == folders
+
+    def find_downloads(folder, downloads_file, root='.'):
+        raise AssertionError("%s/%s is not cached" % (folder, downloads_file))
+
+    with monkeypatch.context() as m:
+        m.setattr(version_data, '_find_downloads', find_downloads)
+        assert get_version_data(downloads_cache=True, **kwargs) == expected
+        (root / 'v2.0.0' / '_downloads').write_text(
+            "[pdf]: /v2.0.0/doc.pdf\n[zip]: /v2.0.0/doc.zip\n"
+        )
+        with pytest.raises(AssertionError) as exc_info:
+            get_version_data(downloads_cache=True, **kwargs)
+        assert "v2.0.0/_downloads is not cached" in str(exc_info.value)
+
+    data = get_version_data(downloads_cache=True, **kwargs)
+    assert data['downloads']['v2.0.0'] == [
+        ('pdf', '/v2.0.0/doc.pdf'),
+        ('zip', '/v2.0.0/doc.zip'),
+    ]
+    assert data['downloads']['v1.0.0'] == expected['downloads']['v1.0.0']
+    cache_file.write_text("invalid")
+    assert get_version_data(downloads_cache=True, **kwargs) == data
+    assert json.loads(cache_file.read_text())['version'] == 1
+    cache = json.loads(cache_file.read_text())
+    cache['downloads']['v1.0.0/_downloads'] = 5
+    cache['downloads']['v2.0.0/_downloads'][3] = [['pdf']]
+    cache_file.write_text(json.dumps(cache))
+    assert get_version_data(downloads_cache=True, **kwargs) == data
+    cache = json.loads(cache_file.read_text())
+    assert cache['downloads']['v1.0.0/_downloads'][3] == [
+        ['pdf', '/v1.0.0/doc.pdf']
+    ]
+
+
+def test_incremental(tmp_path, monkeypatch):
+    """Test re-using the downloads of unchanged folders."""
+    folders = ['master', 'v1.0.0', 'v2.0.0']
+    root = make_gh_pages(tmp_path / 'gh-pages', folders)
+    for folder in folders:
+        (root / folder / '_downloads').write_text(
+            "[pdf]: /%s/doc.pdf\n" % folder
+        )
+    kwargs = version_data_kwargs(root, {})
+    kwargs['downloads_file'] = '_downloads'
+    expected = get_version_data(**kwargs)
+    assert 'fingerprints' not in expected
+    data = get_version_data(previous_data={}, **kwargs)
+    assert data.pop('fingerprints').keys() == set(folders)
+    assert data == expected
+    previous_data = json.loads(
+        json.dumps(get_version_data(previous_data={}, **kwargs))
+    )
+
+    read_folders = []
+    find_downloads = version_data._find_downloads
+
+    def find_downloads_logged(folder, downloads_file, root='.'):
+        read_folders.append(folder)
+        return find_downloads(folder, downloads_file, root)
+
+    monkeypatch.setattr(version_data, '_find_downloads', find_downloads_logged)
+    data = get_version_data(previous_data=previous_data, **kwargs)
+    assert read_folders == []
+    assert data['downloads'] == expected['downloads']
+    assert data['fingerprints'] == previous_data['fingerprints']
+
+    (root / 'v2.0.0' / '_downloads').write_text(
+        "[pdf]: /v2.0.0/doc.pdf\n[zip]: /v2.0.0/doc.zip\n"
+    )
+    (root / 'v1.0.0').rename(root / 'v1.1.0')
+    data = get_version_data(previous_data=previous_data, **kwargs)
+    assert sorted(read_folders) == ['v1.1.0', 'v2.0.0']
+    assert data['folders'] == ['master', 'v1.1.0', 'v2.0.0']
+    assert data['downloads'] == {
+        'master': [('pdf', '/master/doc.pdf')],
+        'v1.1.0': [('pdf', '/v1.0.0/doc.pdf')],
+        'v2.0.0': [('pdf', '/v2.0.0/doc.pdf'), ('zip', '/v2.0.0/doc.zip')],
+    }
+    assert data['latest'] == 'v2.0.0'
+    assert data['warnings']['v1.1.0'] == ['outdated']
+    fingerprints = version_data._get_fingerprints(
+        ['master', 'removed'], '_downloads', root
+    )
+    assert list(fingerprints.keys()) == ['master']
+    stat = (root / 'master' / '_downloads').stat()
+    assert fingerprints['master'][1:] == [
+        '_downloads',
+        stat.st_mtime_ns,
+        stat.st_size,
+    ]
@@ -0,0 +1,60 @@
+"""Test the sorted index of folder names."""
+
+from docs_versions_menu.folder_spec import resolve_folder_spec
+from docs_versions_menu.groups import get_groups
+from docs_versions_menu.version_index import VersionIndex
+
+
+def test_version_index():
+    """Test sorting and range queries of :class:`VersionIndex`."""
+    folders = ['v1.0.0', 'v0.1.0', 'master', 'v1.0.0-rc1', 'v2.0.0', 'v1.1']
+    index = VersionIndex(folders)
+    assert index.folders == (
+        'master',
+        'v0.1.0',
+        'v1.0.0-rc1',
+        'v1.0.0',
+        'v1.1',
+        'v2.0.0',
+    )
+    assert len(index) == 6
+    assert list(index) == list(index.folders)
+    assert index[-1] == 'v2.0.0'
+    assert 'v1.1' in index
+    assert 'v1.1.0' not in index
+    assert index.range(lower='v1.0.0') == ('v1.0.0', 'v1.1', 'v2.0.0')
+    assert index.range(lower='v1.0.0', lower_inclusive=False) == (
+        'v1.1',
+        'v2.0.0',
+    )
+    assert index.range(upper='v1.1.0') == (
+        'master',
+        'v0.1.0',
+        'v1.0.0-rc1',
+        'v1.0.0',
+        'v1.1',
+    )
+    assert index.range(upper='1.1', upper_inclusive=False) == (
+        'master',
+        'v0.1.0',
+        'v1.0.0-rc1',
+        'v1.0.0',
+    )
+    assert index.range(lower='v1.0', upper='v1.0') == ('v1.0.0',)
+    assert index.range(lower='v3.0', upper='v0.1') == ()
+    assert index.index_range(lower='v3.0', upper='v0.1') == (6, 2)
+
+
+def test_range_conditions():
+    """Test that range conditions resolved via bisection are correct."""
+    folders = ['master', 'v0.1.0', 'v1.0.0-rc1', 'v1.0.0', 'v1.1.0', 'v2.0.0']
+    groups = get_groups(folders)
+    assert resolve_folder_spec('(<releases> >= 1.0 < 2.0)', groups) == [
+        'v1.0.0',
+        'v1.1.0',
+    ]
+    assert resolve_folder_spec(
+        '(<releases> > (<public-releases>)[0] not in <pre-releases>)[::-1]',
+        groups,
+    ) == ['v2.0.0', 'v1.1.0', 'v1.0.0']
+    assert resolve_folder_spec('(<releases> > 2.0 <= 1.0)', groups) == []